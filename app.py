@@ -1,38 +1,375 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel, validator, Field
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from slowapi.middleware import SlowAPIASGIMiddleware
+from starlette.requests import HTTPConnection
+from limits import parse as parse_limit
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
 import asyncio
 import httpx
 import re
 import json
+import itertools
 import logging
+import random
 import os
+import sys
 import jwt
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, AsyncIterator, AsyncIterable, List, Callable, Awaitable
 import secrets
+import hashlib
+import hmac
+import tempfile
+import threading
+import mmap
+import struct
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text | json
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING")  # per-module overrides, e.g. "app=DEBUG,httpx=WARNING"
+
+class TextLogFormatter(logging.Formatter):
+    """Plain `LEVEL:logger:message` lines, with structured fields appended as key=value"""
+    
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+    
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items() if value is not None)
+        return line
+
+class JsonLogFormatter(logging.Formatter):
+    """One compact JSON object per log record"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            data.update(fields)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, module_levels: str = LOG_LEVELS, stream=None):
+    """Install a single root handler and apply per-module level overrides"""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonLogFormatter() if fmt == "json" else TextLogFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for item in module_levels.split(","):
+        if "=" in item:
+            name, module_level = item.split("=", 1)
+            logging.getLogger(name.strip()).setLevel(module_level.strip().upper())
 
 # Configure logging to hide sensitive information
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
+access_logger = logger.getChild("access")
+slow_logger = logger.getChild("slow")
+
+# Per-request log record, filled in along the request path and emitted once by the middleware
+request_log_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_log_context", default=None)
+
+def log_context(**fields):
+    record = request_log_context.get()
+    if record is not None:
+        record.update(fields)
+
+# Per-request stage durations (seconds), only set while timing is enabled
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def record_timing(stage: str, start: float):
+    """Add the time since `start` to a stage of the current request, when timing is on"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+# Prometheus metrics - set PROMETHEUS_MULTIPROC_DIR to aggregate across worker processes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUESTS_TOTAL = Counter(
+    "samsat_requests_total", "HTTP requests by route and outcome", ["route", "outcome"]
+)
+REQUEST_DURATION = Histogram(
+    "samsat_request_duration_seconds", "Whole-request latency", ["route"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_REQUESTS_TOTAL = Counter(
+    "samsat_upstream_requests_total", "Firestore lookups by HTTP status", ["status"]
+)
+UPSTREAM_DURATION = Histogram(
+    "samsat_upstream_duration_seconds", "Firestore lookup latency in check_standard_plate", buckets=LATENCY_BUCKETS
+)
+UPSTREAM_INFLIGHT = Gauge(
+    "samsat_upstream_inflight", "Firestore lookups in flight", multiprocess_mode="livesum"
+)
+UPSTREAM_POOL_CONNECTIONS = Gauge(
+    "samsat_upstream_pool_connections", "Open connections in the Firestore client pool", multiprocess_mode="livesum"
+)
+UPSTREAM_RETRIES_TOTAL = Counter(
+    "samsat_upstream_retries_total", "Extra Firestore attempts: hedges for slow lookups, retries after errors", ["reason"]
+)
+UPSTREAM_CIRCUIT_OPEN = Gauge(
+    "samsat_upstream_circuit_open", "Workers whose Firestore circuit breaker is open", multiprocess_mode="livesum"
+)
+UPSTREAM_CONCURRENCY_LIMIT = Gauge(
+    "samsat_upstream_concurrency_limit", "Adaptive limit on concurrent Firestore lookups", multiprocess_mode="livesum"
+)
+UPSTREAM_SHED_TOTAL = Counter(
+    "samsat_upstream_shed_total", "Region lookups rejected by the adaptive concurrency limit"
+)
+REGION_CACHE_EVENTS = Counter(
+    "samsat_region_cache_events_total", "Region cache lookups and evictions", ["event"]
+)
+REGION_CACHE_ENTRIES = Gauge(
+    "samsat_region_cache_entries", "Entries in the region cache", multiprocess_mode="livesum"
+)
+GATE_CONNECTIONS = Gauge(
+    "samsat_gate_connections", "Open gate feed WebSocket connections", multiprocess_mode="livesum"
+)
+OCR_CORRECTIONS_TOTAL = Counter(
+    "samsat_ocr_corrections_total", "Plates rejected by the region index, by fuzzy-match outcome", ["outcome"]
+)
+
+# Pre-bound label children keep the hot path to a single increment
+CACHE_HIT = REGION_CACHE_EVENTS.labels(event="hit")
+CACHE_NEGATIVE_HIT = REGION_CACHE_EVENTS.labels(event="negative_hit")
+CACHE_MISS = REGION_CACHE_EVENTS.labels(event="miss")
+CACHE_EVICTION = REGION_CACHE_EVENTS.labels(event="eviction")
+CACHE_INDEX_HIT = REGION_CACHE_EVENTS.labels(event="index_hit")
+CACHE_STALE_HIT = REGION_CACHE_EVENTS.labels(event="stale_hit")
+OCR_CORRECTED = OCR_CORRECTIONS_TOTAL.labels(outcome="corrected")
+OCR_UNRESOLVED = OCR_CORRECTIONS_TOTAL.labels(outcome="unresolved")
+
+def request_outcome(status_code: int, plate_class: Optional[str]) -> str:
+    """Collapse a request into a low-cardinality outcome label"""
+    if status_code == 404:
+        return "not_found"
+    if status_code == 503:
+        return "shed"
+    if status_code >= 400:
+        return "error"
+    if plate_class in ("standard", "old_military"):
+        return plate_class
+    if plate_class in ("state", "diplomatic"):
+        return "non_standard"
+    return plate_class or "ok"
 
 # Security configuration
+ENVIRONMENT = os.getenv("ENVIRONMENT")
 SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = None  # No expiration for development
 
+# Accepted Host header values, comma separated; "*.example.com" matches subdomains
+ALLOWED_HOSTS = [h.strip() for h in os.getenv("ALLOWED_HOSTS", "*").split(",") if h.strip()]
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))  # seconds until the response starts
+
+# Request instrumentation, all off by default
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "false").lower() == "true"  # Server-Timing header per response
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # log the stage breakdown of slower requests, 0 disables
+PROFILE_REQUESTS = int(os.getenv("PROFILE_REQUESTS", "0"))  # sample stacks for the first N requests after startup
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between stack samples
+PROFILE_DIR = os.getenv("PROFILE_DIR", tempfile.gettempdir())  # where folded-stack profiles are written
+
 # Bearer token for Zeabur cloud deployment
 ZEABUR_BEARER_TOKEN = os.getenv("ZEABUR_BEARER_TOKEN", "dev-token")
 
+# Verified JWT cache: repeat callers skip jwt.decode until the entry or the token expires
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))  # seconds
+
+# Upstream (Firestore) connection pool configuration
+FIRESTORE_BASE_URL = os.getenv(
+    "FIRESTORE_BASE_URL",
+    "https://firestore.googleapis.com/v1/projects/informasisamsat/databases/(default)/documents"
+)
+FIRESTORE_TIMEOUT = float(os.getenv("FIRESTORE_TIMEOUT", "20.0"))
+FIRESTORE_MAX_CONNECTIONS = int(os.getenv("FIRESTORE_MAX_CONNECTIONS", "100"))
+FIRESTORE_MAX_KEEPALIVE = int(os.getenv("FIRESTORE_MAX_KEEPALIVE", "20"))
+FIRESTORE_KEEPALIVE_EXPIRY = float(os.getenv("FIRESTORE_KEEPALIVE_EXPIRY", "30.0"))
+FIRESTORE_HTTP2 = os.getenv("FIRESTORE_HTTP2", "false").lower() == "true"
+
+# Region lookup budgets: short per-attempt timeouts, hedged/retried once within a budget, then fail fast
+FIRESTORE_CONNECT_TIMEOUT = float(os.getenv("FIRESTORE_CONNECT_TIMEOUT", "1.0"))
+FIRESTORE_READ_TIMEOUT = float(os.getenv("FIRESTORE_READ_TIMEOUT", "2.0"))
+FIRESTORE_ATTEMPTS = int(os.getenv("FIRESTORE_ATTEMPTS", "2"))  # first attempt plus hedges/retries
+FIRESTORE_HEDGE_DELAY = float(os.getenv("FIRESTORE_HEDGE_DELAY", "0.3"))  # seconds, until the p95 of recent successful attempts is known
+FIRESTORE_RETRY_BUDGET = float(os.getenv("FIRESTORE_RETRY_BUDGET", "0.1"))  # hedges and retries per lookup, at most
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive failed lookups
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # seconds open before a trial lookup
+
+# Adaptive concurrency limit on Firestore lookups (AIMD on upstream latency); lookups over it get a 503
+UPSTREAM_LIMIT_ENABLED = os.getenv("UPSTREAM_LIMIT_ENABLED", "true").lower() == "true"
+UPSTREAM_LIMIT_INITIAL = int(os.getenv("UPSTREAM_LIMIT_INITIAL", "20"))
+UPSTREAM_LIMIT_MIN = int(os.getenv("UPSTREAM_LIMIT_MIN", "2"))
+UPSTREAM_LIMIT_MAX = int(os.getenv("UPSTREAM_LIMIT_MAX", "100"))
+UPSTREAM_LIMIT_TOLERANCE = float(os.getenv("UPSTREAM_LIMIT_TOLERANCE", "2.0"))  # x the no-load latency before backing off
+UPSTREAM_RETRY_AFTER = int(os.getenv("UPSTREAM_RETRY_AFTER", "1"))  # seconds, Retry-After of shed requests
+
+# Region lookup cache configuration (keyed on region prefix + last suffix letter)
+REGION_CACHE_SIZE = int(os.getenv("REGION_CACHE_SIZE", "2048"))
+REGION_CACHE_TTL = float(os.getenv("REGION_CACHE_TTL", "3600"))
+REGION_CACHE_NEGATIVE_TTL = float(os.getenv("REGION_CACHE_NEGATIVE_TTL", "60"))
+REGION_CACHE_STALE_TTL = float(os.getenv("REGION_CACHE_STALE_TTL", "86400"))  # expired regions served while refreshing
+
+# HTTP caching of GET /check-plate results (ETag, Cache-Control, X-Accel-Expires for nginx), 0 disables
+RESULT_CACHE_MAX_AGE = int(os.getenv("RESULT_CACHE_MAX_AGE", "300"))  # seconds, region lookups
+STATIC_RESULT_CACHE_MAX_AGE = int(os.getenv("STATIC_RESULT_CACHE_MAX_AGE", "86400"))  # seconds, military / special plates
+
+# Offline region snapshot (JSON lines dump of nopol/*/belakang/*)
+REGION_SNAPSHOT_PATH = os.getenv("REGION_SNAPSHOT_PATH", "")
+REGION_SNAPSHOT_REFRESH = float(os.getenv("REGION_SNAPSHOT_REFRESH", "0"))  # seconds, 0 disables
+
+# Region data source: firestore (REST) | sqlite (local database) | table (memory-mapped compact file)
+REGION_SOURCE = os.getenv("REGION_SOURCE", "firestore").lower()
+REGION_SOURCE_PATH = os.getenv("REGION_SOURCE_PATH", "")  # database or table file for sqlite / table
+
+# OCR misread correction (O/0, I/1, B/8, S/5, ...) against the known region prefixes and letters
+OCR_FUZZY_MATCH = os.getenv("OCR_FUZZY_MATCH", "false").lower() == "true"
+OCR_FUZZY_MAX_EDITS = int(os.getenv("OCR_FUZZY_MAX_EDITS", "2"))  # max substituted characters per plate
+
+# Batch plate-check configuration
+BATCH_MAX_PLATES = int(os.getenv("BATCH_MAX_PLATES", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "10"))
+BATCH_PLATES_PER_HIT = int(os.getenv("BATCH_PLATES_PER_HIT", "10"))  # plates counted as one rate-limit hit
+
+# Streaming bulk-verification configuration
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "32"))  # max plates in flight per stream
+STREAM_MAX_LINE = 256  # longer input lines are truncated and reported as invalid
+STREAM_SPOOL_SIZE = int(os.getenv("STREAM_SPOOL_SIZE", str(1024 * 1024)))  # upload bytes kept in memory before spilling to disk
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(10 * 1024 * 1024)))  # larger uploads are rejected with 413
+
+# Gate feed WebSocket configuration
+GATE_WINDOW = int(os.getenv("GATE_WINDOW", "32"))  # max plate reads in flight per connection
+GATE_MAX_MESSAGE = 1024  # bytes; longer messages are answered with an error
+
+# Response JSON encoder: orjson (falls back to json when not installed) | json
+JSON_ENCODER = os.getenv("JSON_ENCODER", "orjson").lower()
+if JSON_ENCODER == "orjson":
+    try:
+        import orjson
+    except ImportError:
+        logger.warning("JSON_ENCODER=orjson but 'orjson' is not installed, falling back to json")
+        JSON_ENCODER = "json"
+
+if JSON_ENCODER == "orjson":
+    def json_bytes(content: Any) -> bytes:
+        return orjson.dumps(content)
+else:
+    def json_bytes(content: Any) -> bytes:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with json_bytes; return it directly to skip jsonable_encoder"""
+    
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = json_bytes(content)
+        record_timing("encode", start)
+        return body
+
+# Rate limiting can be switched off for load tests against a stubbed upstream
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT = os.getenv("RATE_LIMIT", "100/minute")  # per client IP
+TOKEN_RATE_LIMIT = os.getenv("TOKEN_RATE_LIMIT", RATE_LIMIT)  # per bearer token
+# Counters shared by every worker, e.g. redis://redis:6379/0; memory:// is per process
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# sliding-window-counter: two counters per key, O(1) per check
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+
+def get_token_key(request: HTTPConnection) -> str:
+    """Rate-limit key for the bearer token, or the client address when there is none"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return "ip:" + get_remote_address(request)
+    return "token:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+class TimedLimiter(Limiter):
+    """Limiter that reports the time spent checking limits as the "ratelimit" stage"""
+    
+    def _check_request_limit(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super()._check_request_limit(*args, **kwargs)
+        finally:
+            record_timing("ratelimit", start)
+    
+    def charge(self, connection: HTTPConnection, endpoint: Callable, cost: int = 1) -> Optional[str]:
+        """Add hits to `endpoint`'s per-IP and per-token counters outside its decorator
+        
+        For work the route decorator cannot size up front (stream lines, WebSocket messages).
+        Returns the exceeded limit, or None when the hits fit.
+        """
+        if not self.enabled:
+            return None
+        # The same counters the decorator uses: keyed on the path, or the function with key_style="endpoint"
+        scope = connection.scope["path"] if self._key_style == "url" else f"{endpoint.__module__}.{endpoint.__name__}"
+        prefix = [self._key_prefix] if self._key_prefix else []
+        start = time.perf_counter()
+        try:
+            for limit, key in ((parse_limit(RATE_LIMIT), get_remote_address(connection)),
+                               (parse_limit(TOKEN_RATE_LIMIT), get_token_key(connection))):
+                if not self.limiter.hit(limit, *prefix, key, scope, cost=cost):
+                    return str(limit)
+            return None
+        except Exception:
+            if not self._in_memory_fallback_enabled or self._storage_dead:
+                raise
+            logger.warning("Rate limit storage unreachable - falling back to in-memory storage")
+            self._storage_dead = True
+            return self.charge(connection, endpoint, cost)
+        finally:
+            record_timing("ratelimit", start)
+
 # Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = TimedLimiter(
+    key_func=get_remote_address,
+    enabled=RATE_LIMIT_ENABLED,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=True  # keep limiting per process if the shared storage is down
+)
+
+def rate_limit(cost=1):
+    """Apply the per-IP and per-token limits to a route"""
+    def decorator(func):
+        func = limiter.limit(TOKEN_RATE_LIMIT, key_func=get_token_key, cost=cost)(func)
+        return limiter.limit(RATE_LIMIT, cost=cost)(func)
+    return decorator
+
+# App lifespan - owns the shared upstream HTTP client
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await checker.startup()
+    if PROFILE_REQUESTS > 0:
+        profiler.start(PROFILE_REQUESTS)
+    try:
+        yield
+    finally:
+        await checker.shutdown()
 
 # Initialize FastAPI app - Documentation hidden completely
 app = FastAPI(
@@ -40,19 +377,15 @@ app = FastAPI(
     description="Secure API for checking Indonesian license plates with institution support & OCR military compatibility",
     version="2.0.0",
     docs_url=None,  # Hide Swagger UI completely
-    redoc_url=None  # Hide ReDoc completely
+    redoc_url=None,  # Hide ReDoc completely
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add rate limiting middleware
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
-
-# Security middleware
-app.add_middleware(
-    TrustedHostMiddleware, 
-    allowed_hosts=["*"]  # Configure allowed hosts in production
-)
+app.add_middleware(SlowAPIASGIMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -62,37 +395,249 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Security headers middleware
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    response = await call_next(request)
-    
-    # Security headers
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Content-Security-Policy"] = "default-src 'self'"
-    response.headers["X-Permitted-Cross-Domain-Policies"] = "none"
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+# Security headers, encoded once; they replace any same-named header set by a route
+SECURITY_HEADERS = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in {
+    "X-Frame-Options": "DENY",
+    "X-Content-Type-Options": "nosniff",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Content-Security-Policy": "default-src 'self'",
+    "X-Permitted-Cross-Domain-Policies": "none",
+}.items()]
+SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
+# Added unless the route set its own Cache-Control
+NO_STORE_HEADERS = [
+    (b"cache-control", b"no-cache, no-store, must-revalidate"),
+    (b"pragma", b"no-cache"),
+    (b"expires", b"0"),
+]
+TIMEOUT_BODY = b'{"error":"Request timeout"}'
+INVALID_HOST_BODY = b"Invalid host header"
+
+def host_allowed(host: str) -> bool:
+    """Match a Host header value against ALLOWED_HOSTS (same rules as Starlette's TrustedHostMiddleware)"""
+    host = host.split(":")[0]
+    for pattern in ALLOWED_HOSTS:
+        if pattern == "*" or host == pattern or (pattern.startswith("*.") and host.endswith(pattern[1:])):
+            return True
+    return False
+
+async def send_plain(send, status_code: int, body: bytes, content_type: bytes):
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode()),
+                    *SECURITY_HEADERS, *NO_STORE_HEADERS]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+def server_timing(timings: Dict[str, float], total: float) -> bytes:
+    """Server-Timing header value: one `stage;dur=ms` entry per stage, then the total"""
+    entries = [f"{stage};dur={duration * 1000:.2f}" for stage, duration in timings.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries).encode("latin-1")
+
+class SamplingProfiler:
+    """Samples the event-loop thread's Python stack while armed and writes the folded stacks
     
-    return response
+    The output has one `frame;frame;frame count` line per distinct stack, the input format of
+    flamegraph.pl and speedscope. Samples are only kept while a profiled request is in flight;
+    time spent waiting on I/O shows up under the event loop's select frame.
+    """
+    
+    def __init__(self, interval: float = PROFILE_INTERVAL, directory: str = PROFILE_DIR):
+        self.interval = interval
+        self.directory = directory
+        self.active = False
+        self.session = 0
+        self.remaining = 0
+        self.inflight = 0
+        self.last_path: Optional[str] = None
+        self._samples: Dict[str, int] = {}
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self, requests: int) -> bool:
+        """Profile the next `requests` requests; call from the event-loop thread. False if already running"""
+        if self.active:
+            return False
+        self.session += 1
+        self.remaining = requests
+        self.inflight = 0
+        self._samples = {}
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.active = True
+        self._thread.start()
+        logger.info("Profiling the next %d requests", requests)
+        return True
+    
+    def request_started(self):
+        self.inflight += 1
+    
+    def request_finished(self, session: int):
+        if session != self.session or not self.active:
+            return
+        self.inflight -= 1
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.stop()
+    
+    def stop(self) -> Optional[str]:
+        """Stop sampling and write the profile; returns its path"""
+        if not self.active:
+            return None
+        self.active = False
+        self._stop.set()
+        self._thread.join()
+        path = os.path.join(self.directory, f"samsat-profile-{os.getpid()}-{self.session}.folded")
+        with open(path, "w") as f:
+            for stack, count in sorted(self._samples.items()):
+                f.write(f"{stack} {count}\n")
+        self.last_path = path
+        logger.info("Profile written to %s (%d samples)", path, sum(self._samples.values()))
+        return path
+    
+    def _run(self):
+        samples = self._samples
+        while not self._stop.wait(self.interval):
+            if self.inflight <= 0:
+                continue
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                samples[key] = samples.get(key, 0) + 1
 
-# Request timeout middleware
-@app.middleware("http")
-async def timeout_middleware(request: Request, call_next):
-    try:
-        # Set timeout for requests (30 seconds)
-        return await asyncio.wait_for(call_next(request), timeout=30.0)
-    except asyncio.TimeoutError:
-        logger.warning(f"Request timeout for {request.url}")
-        return JSONResponse(
-            status_code=408,
-            content={"error": "Request timeout"}
-        )
+profiler = SamplingProfiler()
+
+class RequestGuardMiddleware:
+    """Pure ASGI edge middleware: trusted host, security headers, request deadline, metrics and access log
+    
+    WebSocket handshakes only get the trusted host check; everything else applies to HTTP.
+    
+    Replaces TrustedHostMiddleware and the BaseHTTPMiddleware-style security-header and timeout
+    wrappers; the response body is passed through untouched. Also owns the opt-in
+    instrumentation: per-stage timings (Server-Timing, slow-request log) and the profiler.
+    """
+    
+    def __init__(self, app, timeout: float = REQUEST_TIMEOUT, timing: bool = REQUEST_TIMING,
+                 slow_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.timeout = timeout
+        self.check_host = "*" not in ALLOWED_HOSTS
+        self.timing = timing
+        self.slow_ms = slow_ms
+        self.collect_timings = timing or slow_ms > 0
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            if scope["type"] == "websocket" and self.check_host and not self.host_allowed(scope):
+                # Closing before accept rejects the handshake (HTTP 403)
+                await send({"type": "websocket.close", "code": status.WS_1008_POLICY_VIOLATION})
+                return
+            await self.app(scope, receive, send)
+            return
+        
+        record = {"method": scope["method"], "path": scope["path"]}
+        request_log_context.set(record)
+        start = time.perf_counter()
+        status_code = 500
+        started = False
+        timed_out = False
+        timings = None
+        if self.collect_timings:
+            timings = {}
+            request_timings.set(timings)
+        session = None
+        if profiler.active and not scope["path"].startswith("/admin/"):
+            session = profiler.session
+            profiler.request_started()
+        
+        if self.check_host and not self.host_allowed(scope):
+            status_code = 400
+            await send_plain(send, 400, INVALID_HOST_BODY, b"text/plain; charset=utf-8")
+            self.finish(scope, record, status_code, start, timings, session)
+            return
+        
+        async def send_wrapper(message):
+            nonlocal status_code, started
+            if message["type"] == "http.response.start":
+                started = True
+                deadline.cancel()
+                status_code = message["status"]
+                headers = message.get("headers", [])
+                if any(name in SECURITY_HEADER_NAMES for name, _ in headers):
+                    headers = [(name, value) for name, value in headers if name not in SECURITY_HEADER_NAMES]
+                if any(name == b"cache-control" for name, _ in headers):
+                    message["headers"] = [*headers, *SECURITY_HEADERS]
+                else:
+                    message["headers"] = [*headers, *SECURITY_HEADERS, *NO_STORE_HEADERS]
+                if self.timing and timings is not None:
+                    message["headers"].append((b"server-timing", server_timing(timings, time.perf_counter() - start)))
+            await send(message)
+        
+        # Cancel this task if the app has not started its response by the deadline
+        task = asyncio.current_task()
+        
+        def expire():
+            nonlocal timed_out
+            if not started:
+                timed_out = True
+                task.cancel()
+        
+        deadline = asyncio.get_running_loop().call_later(self.timeout, expire)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except asyncio.CancelledError:
+            if not timed_out:
+                raise
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            logger.warning("Request timeout for %s", scope["path"])
+            status_code = 408
+            await send_plain(send, 408, TIMEOUT_BODY, b"application/json")
+        finally:
+            deadline.cancel()
+            self.finish(scope, record, status_code, start, timings, session)
+    
+    @staticmethod
+    def host_allowed(scope) -> bool:
+        host = next((value for name, value in scope["headers"] if name == b"host"), b"")
+        return host_allowed(host.decode("latin-1"))
+    
+    def finish(self, scope, record, status_code: int, start: float, timings: Optional[Dict[str, float]] = None,
+               session: Optional[int] = None):
+        duration = time.perf_counter() - start
+        if session is not None:
+            profiler.request_finished(session)
+        
+        # Label by route template, not raw path, to keep metric cardinality bounded
+        route = scope.get("route")
+        route_label = route.path if route is not None else "unmatched"
+        REQUESTS_TOTAL.labels(route_label, request_outcome(status_code, record.get("plate_class"))).inc()
+        REQUEST_DURATION.labels(route_label).observe(duration)
+        
+        # One compact record per request instead of per-step INFO lines
+        if access_logger.isEnabledFor(logging.INFO):
+            record["status"] = status_code
+            record["duration_ms"] = round(duration * 1000, 2)
+            access_logger.info("request", extra={"fields": record})
+        
+        if self.slow_ms and duration * 1000 >= self.slow_ms:
+            fields = dict(record, status=status_code, duration_ms=round(duration * 1000, 2))
+            for stage, stage_duration in (timings or {}).items():
+                fields[f"{stage}_ms"] = round(stage_duration * 1000, 2)
+            slow_logger.warning("slow request", extra={"fields": fields})
+
+app.add_middleware(RequestGuardMiddleware)
 
 # Pydantic models for input validation
 class PlateRequest(BaseModel):
@@ -108,128 +653,1230 @@ class PlateRequest(BaseModel):
             raise ValueError('Invalid plate format')
         return cleaned
 
+class PlateBatchRequest(BaseModel):
+    plates: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_PLATES, description="License plate numbers")
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
 # Security schemes
 security = HTTPBearer()
 
-print("=== FASTAPI APP STARTING WITH INSTITUTION SUPPORT & OCR MILITARY COMPATIBILITY ===")
+print("=== FASTAPI APP STARTING WITH INSTITUTION SUPPORT & OCR MILITARY COMPATIBILITY ===", file=sys.stderr)
 
-class IndonesianPlateChecker:
-    def __init__(self):
-        self.base_url = "https://firestore.googleapis.com/v1/projects/informasisamsat/databases/(default)/documents"
-        
-        # Institution codes for suffix
-        self.institution_codes = {
-            'ZZT': 'Markas Besar TNI',
-            'ZZU': 'TNI AU',
-            'ZZD': 'TNI AD',
-            'ZZL': 'TNI AL',
-            'ZZP': 'POLRI',
-            'ZZH': 'Kementrian / Lembaga Negara'
+# Plate classes returned by IndonesianPlateChecker.classify
+PLATE_OLD_MILITARY = "old_military"
+PLATE_STANDARD = "standard"
+PLATE_STATE = "state"
+PLATE_DIPLOMATIC = "diplomatic"
+PLATE_INVALID = "invalid"
+
+# Precompiled plate patterns, shared by every lookup
+OLD_MILITARY_PATTERN = re.compile(r'^(\d{4,5})-([0-9]{2}|I|II|III|IV|V|VI|VII|VIII|IX)$')  # 4-5 digits + 00-99 or I-IX
+STANDARD_PLATE_PATTERN = re.compile(r'^([A-Z]+)(\d+)([A-Z]+)$')
+STATE_PLATE_PATTERN = re.compile(r'^RI\d*$')
+DIPLOMATIC_PLATE_PATTERN = re.compile(r'^(CC|CD|CN|CS)\d*$')
+MILITARY_NUMBER_PATTERN = re.compile(r'^\d{4,5}$')
+
+class ParsedPlate:
+    """A plate normalized and classified once, reused by the result handlers"""
+    __slots__ = ("kind", "original", "clean", "prefix", "middle", "suffix", "number", "military_suffix")
+    
+    def __init__(self, kind: str, original: str, clean: str, prefix: Optional[str] = None,
+                 middle: Optional[int] = None, suffix: Optional[str] = None,
+                 number: Optional[str] = None, military_suffix: Optional[str] = None):
+        self.kind = kind
+        self.original = original
+        self.clean = clean
+        self.prefix = prefix
+        self.middle = middle
+        self.suffix = suffix
+        self.number = number
+        self.military_suffix = military_suffix
+    
+    def __repr__(self):
+        return f"ParsedPlate(kind={self.kind!r}, clean={self.clean!r})"
+
+def non_standard_kind(plate_clean: str) -> str:
+    if STATE_PLATE_PATTERN.match(plate_clean):
+        return PLATE_STATE
+    if DIPLOMATIC_PLATE_PATTERN.match(plate_clean):
+        return PLATE_DIPLOMATIC
+    return PLATE_INVALID
+
+# Classification tables, built once at import and immutable: gunicorn workers forked from the
+# preloaded master share them copy-on-write
+INSTITUTION_CODES = MappingProxyType({
+    'ZZT': 'Markas Besar TNI',
+    'ZZU': 'TNI AU',
+    'ZZD': 'TNI AD',
+    'ZZL': 'TNI AL',
+    'ZZP': 'POLRI',
+    'ZZH': 'Kementrian / Lembaga Negara'
+})
+NUMERIC_SUFFIXES = frozenset(f"{n:02d}" for n in range(100))
+ROMAN_SUFFIXES = frozenset(('I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX'))
+
+def numeric_suffix_institution(n: int) -> str:
+    if n == 0:
+        return 'ZZT'  # TNI Headquarters
+    if n <= 5:
+        return 'ZZD'  # TNI Army
+    if n <= 8:
+        return 'ZZL'  # TNI Navy
+    if n <= 11:
+        return 'ZZU'  # TNI Air Force
+    if n <= 15:
+        return 'ZZP'  # POLRI
+    return 'ZZD'  # other suffixes default to TNI Army
+
+# Old military numeric suffix 00-99 -> institution code, indexed by int(suffix); Roman I-IX are TNI Army
+MILITARY_NUMERIC_INSTITUTIONS = tuple(numeric_suffix_institution(n) for n in range(100))
+MILITARY_ROMAN_INSTITUTION = 'ZZD'
+# Keyed by the suffix text as parsed, so one lookup both validates a suffix and maps it
+MILITARY_SUFFIX_MAPPING = MappingProxyType({
+    **{f"{n:02d}": code for n, code in enumerate(MILITARY_NUMERIC_INSTITUTIONS)},
+    **dict.fromkeys(ROMAN_SUFFIXES, MILITARY_ROMAN_INSTITUTION),
+})
+
+# Vehicle type ranges by registration number: VEHICLE_TYPES[bisect_right(VEHICLE_TYPE_BOUNDS, number)],
+# flattened into a table indexed by number for the 1-4 digit numbers plates carry
+VEHICLE_TYPE_BOUNDS = (1, 2000, 7000, 8000, 9000, 10000)
+VEHICLE_TYPES = ("Tidak Diketahui", "Mobil Penumpang", "Sepeda Motor", "Mobil Bus", "Mobil Barang",
+                 "Kendaraan Khusus", "Tidak Diketahui")
+VEHICLE_TYPE_BY_NUMBER = tuple(VEHICLE_TYPES[bisect_right(VEHICLE_TYPE_BOUNDS, n)] for n in range(10000))
+
+def vehicle_type(number: int) -> str:
+    if 0 <= number < 10000:
+        return VEHICLE_TYPE_BY_NUMBER[number]
+    return VEHICLE_TYPES[bisect_right(VEHICLE_TYPE_BOUNDS, number)]
+
+# Common OCR misreads, by the character class a position needs
+OCR_DIGIT_CONFUSABLES = {"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "Z": "2", "A": "4", "S": "5", "G": "6",
+                         "T": "7", "B": "8"}
+OCR_LETTER_CONFUSABLES = {"0": "OD", "1": "I", "2": "Z", "4": "A", "5": "S", "6": "G", "7": "T", "8": "B",
+                          "O": "DQ", "D": "O", "Q": "O"}
+OCR_ROMAN_CONFUSABLES = {"1": "I", "L": "I"}
+
+class PlateIndex:
+    """Known (prefix, letter) region pairs from nopol, for ranking OCR-confusable readings of a plate
+    
+    Membership is a set lookup, and a plate has at most a few dozen structural readings
+    (prefix/number/suffix splits times the confusable letters at the two region positions),
+    so correcting a plate costs microseconds whatever the size of the index.
+    """
+    
+    def __init__(self, pairs=(), max_edits: int = OCR_FUZZY_MAX_EDITS):
+        self.pairs = frozenset(pairs)
+        self.prefixes = frozenset(prefix for prefix, _ in self.pairs)
+        self.max_edits = max_edits
+    
+    @classmethod
+    def from_regions(cls, index: Dict[Tuple[str, str], Dict[str, Any]]) -> "PlateIndex":
+        return cls(pairs=[key for key, result in index.items() if "error" not in result])
+    
+    def __len__(self):
+        return len(self.pairs)
+    
+    def accepts(self, parsed: ParsedPlate) -> bool:
+        """True when the plate needs no correction"""
+        if parsed.kind == PLATE_STANDARD:
+            return (parsed.prefix, parsed.suffix[-1]) in self.pairs
+        return parsed.kind != PLATE_INVALID
+    
+    @staticmethod
+    def letter_options(char: str) -> List[Tuple[str, int]]:
+        options = [(char, 0)] if char.isalpha() else []
+        return options + [(alt, 1) for alt in OCR_LETTER_CONFUSABLES.get(char, "")]
+    
+    @staticmethod
+    def as_digits(text: str) -> Optional[Tuple[str, int]]:
+        digits, edits = [], 0
+        for char in text:
+            if char.isdigit():
+                digits.append(char)
+            elif char in OCR_DIGIT_CONFUSABLES:
+                digits.append(OCR_DIGIT_CONFUSABLES[char])
+                edits += 1
+            else:
+                return None
+        return "".join(digits), edits
+    
+    def standard_candidates(self, plate_clean: str):
+        """Yield (edits, -number length, prefix length, plate) for each valid standard reading"""
+        for prefix_len in (1, 2):
+            for suffix_len in (1, 2, 3):
+                number_len = len(plate_clean) - prefix_len - suffix_len
+                if not 1 <= number_len <= 4:
+                    continue
+                number = self.as_digits(plate_clean[prefix_len:prefix_len + number_len])
+                if number is None:
+                    continue
+                # Letters between the number and the region letter take their most likely reading
+                head = [self.letter_options(char) for char in plate_clean[prefix_len + number_len:-1]]
+                if not all(head):
+                    continue
+                base_edits = number[1] + sum(options[0][1] for options in head)
+                middle = number[0] + "".join(options[0][0] for options in head)
+                for prefix_options in itertools.product(*(self.letter_options(c) for c in plate_clean[:prefix_len])):
+                    prefix = "".join(char for char, _ in prefix_options)
+                    if prefix not in self.prefixes:
+                        continue
+                    for letter, letter_edits in self.letter_options(plate_clean[-1]):
+                        if (prefix, letter) not in self.pairs:
+                            continue
+                        edits = base_edits + letter_edits + sum(e for _, e in prefix_options)
+                        if edits <= self.max_edits:
+                            yield edits, -number_len, prefix_len, prefix + middle + letter
+    
+    def military_candidates(self, plate_spaced: str):
+        """Yield (edits, 0, 0, plate) for each valid old military reading (NNNN-NN / NNNNN-IV)"""
+        number_part, _, suffix_part = plate_spaced.partition("-")
+        number = self.as_digits(number_part)
+        if number is None or not 4 <= len(number[0]) <= 5:
+            return
+        readings = []
+        if len(suffix_part) == 2:
+            readings.append(self.as_digits(suffix_part))
+        roman = [OCR_ROMAN_CONFUSABLES.get(char, char) for char in suffix_part]
+        readings.append(("".join(roman), sum(a != b for a, b in zip(roman, suffix_part))))
+        for reading in readings:
+            if reading is None:
+                continue
+            plate = f"{number[0]}-{reading[0]}"
+            edits = number[1] + reading[1]
+            if edits <= self.max_edits and OLD_MILITARY_PATTERN.match(plate):
+                yield edits, 0, 0, plate
+    
+    def correct(self, plate_number: str) -> Optional[Tuple[str, int]]:
+        """Best valid reading of a misread plate as (plate, substituted characters), or None"""
+        plate_spaced = plate_number.replace(' ', '').upper()
+        candidates = list(self.standard_candidates(plate_spaced.replace('-', '')))
+        if plate_spaced.count("-") == 1:
+            candidates.extend(self.military_candidates(plate_spaced))
+        if not candidates:
+            return None
+        edits, _, _, plate = min(candidates)
+        return (plate, edits) if edits else None
+
+def create_upstream_client(
+    max_connections: int = FIRESTORE_MAX_CONNECTIONS,
+    max_keepalive: int = FIRESTORE_MAX_KEEPALIVE,
+    keepalive_expiry: float = FIRESTORE_KEEPALIVE_EXPIRY,
+    http2: bool = FIRESTORE_HTTP2,
+    timeout: float = FIRESTORE_TIMEOUT,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> httpx.AsyncClient:
+    """Build a long-lived pooled client for Firestore lookups"""
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("FIRESTORE_HTTP2 enabled but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+    
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits, http2=http2, transport=transport)
+
+async def list_documents(client: httpx.AsyncClient, url: str, page_size: int = 300,
+                         show_missing: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Iterate a Firestore collection through the list-documents API, following pagination"""
+    params = {"pageSize": page_size}
+    if show_missing:
+        # Parent documents like nopol/{prefix} may only exist as subcollection holders
+        params["showMissing"] = "true"
+    while True:
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        page = response.json()
+        for document in page.get("documents", []):
+            yield document
+        next_page = page.get("nextPageToken")
+        if not next_page:
+            return
+        params["pageToken"] = next_page
+
+@contextmanager
+def replacing(path: str):
+    """Yield a temp file path beside `path` that replaces it on success and is removed on failure
+    
+    Every worker refreshes the snapshot on the same schedule, so each write needs its own temp file.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, 0o644)
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_region_snapshot(index: Dict[Tuple[str, str], Dict[str, Any]], path: str):
+    """Write the region index as JSON lines, replacing the previous snapshot atomically"""
+    with replacing(path) as tmp_path, open(tmp_path, "w", encoding="utf-8") as f:
+        for (prefix, letter), result in sorted(index.items()):
+            f.write(json.dumps({"prefix": prefix, "letter": letter, "plate_region": result["plate_region"]},
+                               ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+
+def load_region_snapshot(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Load a JSON lines snapshot into an in-memory (prefix, letter) -> region index"""
+    index = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                index[(row["prefix"], row["letter"])] = {"plate_region": row["plate_region"]}
+    return index
+
+REGION_FIELDS = ("province", "city", "samsat_office", "address")
+
+# Compact region table: header, sorted fixed-size index records, then the field data.
+# Keys are the prefix NUL-padded to 3 bytes plus the suffix letter; fields are UTF-8 joined by 0x1f.
+REGION_TABLE_MAGIC = b"SAMSATR1"
+REGION_TABLE_HEADER = struct.Struct("<8sI")  # magic, record count
+REGION_TABLE_RECORD = struct.Struct("<4sII")  # key, data offset, data length
+
+def region_table_key(prefix: str, letter: str) -> Optional[bytes]:
+    if len(prefix) > 3 or len(letter) != 1 or not (prefix + letter).isascii():
+        return None
+    return prefix.encode("ascii").ljust(3, b"\0") + letter.encode("ascii")
+
+def write_region_sqlite(index: Dict[Tuple[str, str], Dict[str, Any]], path: str):
+    """Write the region index as a SQLite database for SQLiteRegionSource, replacing it atomically"""
+    import sqlite3  # only needed for the sqlite source; kept off the import path of app:app
+    with replacing(path) as tmp_path:
+        db = sqlite3.connect(tmp_path)
+        try:
+            db.execute(
+                "CREATE TABLE regions (prefix TEXT NOT NULL, letter TEXT NOT NULL, province TEXT, city TEXT, "
+                "samsat_office TEXT, address TEXT, PRIMARY KEY (prefix, letter)) WITHOUT ROWID"
+            )
+            db.executemany(
+                "INSERT INTO regions VALUES (?, ?, ?, ?, ?, ?)",
+                [(prefix, letter, *(result["plate_region"].get(field, "") for field in REGION_FIELDS))
+                 for (prefix, letter), result in sorted(index.items())]
+            )
+            db.commit()
+        finally:
+            db.close()
+
+def write_region_table(index: Dict[Tuple[str, str], Dict[str, Any]], path: str):
+    """Write the region index as a compact table for RegionTableSource, replacing it atomically"""
+    rows = []
+    for (prefix, letter), result in index.items():
+        key = region_table_key(prefix, letter)
+        if key is None:
+            logger.warning(f"Region key {prefix}/{letter} does not fit the table format, skipped")
+            continue
+        data = "\x1f".join(result["plate_region"].get(field, "") for field in REGION_FIELDS).encode("utf-8")
+        rows.append((key, data))
+    rows.sort()
+    
+    records, blobs = [], []
+    offset = REGION_TABLE_HEADER.size + len(rows) * REGION_TABLE_RECORD.size
+    for key, data in rows:
+        records.append(REGION_TABLE_RECORD.pack(key, offset, len(data)))
+        blobs.append(data)
+        offset += len(data)
+    
+    with replacing(path) as tmp_path, open(tmp_path, "wb") as f:
+        f.write(REGION_TABLE_HEADER.pack(REGION_TABLE_MAGIC, len(rows)))
+        f.writelines(records)
+        f.writelines(blobs)
+
+def export_regions(index: Dict[Tuple[str, str], Dict[str, Any]], path: str):
+    """Write a region index in the format implied by the file extension (.db/.sqlite, .tbl, else JSON lines)"""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        write_region_sqlite(index, path)
+    elif path.endswith(".tbl"):
+        write_region_table(index, path)
+    else:
+        save_region_snapshot(index, path)
+
+def upstream_pool_size(client: httpx.AsyncClient) -> int:
+    # httpx has no public pool statistics; read the httpcore pool when available
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    return len(getattr(pool, "connections", ()))
+
+def upstream_failed(status_code: int) -> bool:
+    """Statuses worth retrying and counted against the circuit breaker"""
+    return status_code >= 500 or status_code == 429
+
+class RetryBudget:
+    """Token bucket for hedges and retries: each lookup earns `ratio` of a token, each extra attempt spends one
+    
+    However slow or unhealthy Firestore gets, extra attempts stay within `ratio` of lookups; the
+    starting `burst` lets a quiet worker still hedge its first slow lookups.
+    """
+    
+    def __init__(self, ratio: float = FIRESTORE_RETRY_BUDGET, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+    
+    def deposit(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+    
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class LatencyQuantile:
+    """A quantile of the last `size` latencies, at most `maximum`, recomputed every `every` samples; `initial` until then"""
+    
+    def __init__(self, quantile: float = 0.95, size: int = 500, every: int = 50, initial: float = FIRESTORE_HEDGE_DELAY,
+                 maximum: float = FIRESTORE_READ_TIMEOUT / 2):
+        self.quantile = quantile
+        self.maximum = maximum
+        self.samples = deque(maxlen=size)
+        self.every = every
+        self.count = 0
+        self.value = initial
+    
+    def add(self, latency: float):
+        self.samples.append(latency)
+        self.count += 1
+        if self.count % self.every == 0:
+            ordered = sorted(self.samples)
+            self.value = min(self.maximum, ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))])
+
+async def hedged_get(attempt: Callable[[], Awaitable[httpx.Response]], hedge_delay: float = FIRESTORE_HEDGE_DELAY,
+                     max_attempts: int = FIRESTORE_ATTEMPTS,
+                     may_add: Optional[Callable[[bool], bool]] = None) -> httpx.Response:
+    """Run an idempotent request, adding attempts when it is slow or fails; the first usable response wins
+    
+    A hedge starts when nothing has answered within hedge_delay; a failed attempt is retried after
+    a jittered pause. Each extra attempt must also be allowed by `may_add`, told whether it would run
+    alongside a pending one (a hedge) or alone (a retry). Returns the last failed response or raises
+    the last error when every attempt failed.
+    """
+    def extra_allowed(hedge: bool) -> bool:
+        return started < max_attempts and (may_add is None or may_add(hedge))
+    
+    pending = set()
+    started = 0
+    failure = None
+    try:
+        while True:
+            pending.add(asyncio.ensure_future(attempt()))
+            started += 1
+            hedging = started < max_attempts
+            while True:
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay if hedging else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if extra_allowed(True):
+                        UPSTREAM_RETRIES_TOTAL.labels("hedge").inc()
+                        break
+                    hedging = False
+                    continue
+                for task in done:
+                    try:
+                        response = task.result()
+                    except httpx.HTTPError as e:
+                        failure = e
+                        continue
+                    if not upstream_failed(response.status_code):
+                        return response
+                    failure = response
+                if pending:
+                    continue
+                if not extra_allowed(False):
+                    if isinstance(failure, httpx.Response):
+                        return failure
+                    raise failure
+                await asyncio.sleep(random.uniform(0, hedge_delay))
+                UPSTREAM_RETRIES_TOTAL.labels("error").inc()
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+
+class RegionCache:
+    """Bounded TTL/LRU cache for region lookups, with separate TTL for not-found results
+    
+    Expired regions are kept for stale_ttl more seconds so get_stale can serve them while a refresh runs.
+    """
+    
+    def __init__(self, maxsize: int = REGION_CACHE_SIZE, ttl: float = REGION_CACHE_TTL,
+                 negative_ttl: float = REGION_CACHE_NEGATIVE_TTL, stale_ttl: float = REGION_CACHE_STALE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, negative)
+        self.hits = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            CACHE_MISS.inc()
+            return None
+        expires_at, value, negative = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if not negative and expires_at + self.stale_ttl > now:
+                return None  # counted by get_stale when it is served
+            del self._entries[key]
+            REGION_CACHE_ENTRIES.dec()
+            self.misses += 1
+            CACHE_MISS.inc()
+            return None
+        self._entries.move_to_end(key)
+        if negative:
+            self.negative_hits += 1
+            CACHE_NEGATIVE_HIT.inc()
+        else:
+            self.hits += 1
+            CACHE_HIT.inc()
+        return value
+    
+    def get_stale(self, key):
+        """Return an expired but still servable region, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, negative = entry
+        if negative or expires_at + self.stale_ttl <= time.monotonic():
+            return None
+        self.stale_hits += 1
+        CACHE_STALE_HIT.inc()
+        return value
+    
+    def set(self, key, value, negative: bool = False):
+        ttl = self.negative_ttl if negative else self.ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        if key not in self._entries:
+            REGION_CACHE_ENTRIES.inc()
+        self._entries[key] = (time.monotonic() + ttl, value, negative)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            REGION_CACHE_ENTRIES.dec()
+            self.evictions += 1
+            CACHE_EVICTION.inc()
+    
+    def clear(self):
+        REGION_CACHE_ENTRIES.dec(len(self._entries))
+        self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions
         }
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight upstream request"""
+    
+    def __init__(self):
+        self._calls: Dict[Any, asyncio.Future] = {}
+    
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        # Shield so one cancelled waiter does not cancel the request shared by the others
+        return await asyncio.shield(future)
+    
+    def _forget(self, key, future: asyncio.Future):
+        # Drop finished calls so errors are never served to later callers
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()  # mark retrieved when every waiter went away
+    
+    def __len__(self):
+        return len(self._calls)
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling Firestore while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Fail fast after consecutive upstream failures; allow one trial call per reset_timeout while open"""
+    
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+    
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+    
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        # Half-open: this caller is the trial; others keep failing fast for another period
+        self.opened_at = now
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        if self.opened_at is not None:
+            self.opened_at = None
+            UPSTREAM_CIRCUIT_OPEN.dec()
+            logger.info("Upstream circuit closed")
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            UPSTREAM_CIRCUIT_OPEN.inc()
+            logger.warning("Upstream circuit opened after %d consecutive failures", self.failures)
+        elif self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+class UpstreamOverloaded(Exception):
+    """Raised instead of calling Firestore while the adaptive concurrency limit is reached"""
+
+OVERLOADED_ERROR = "Service overloaded"
+
+class AdaptiveConcurrencyLimit:
+    """AIMD limit on concurrent upstream calls, driven by their latency
+    
+    A timeout, or recent latency of successful calls (a short moving average) above `tolerance`
+    times the baseline, cuts the limit by `backoff`, at most once per round trip. Other errors
+    leave it alone: they are the circuit breaker's concern, and a failed call's latency includes
+    its retries. Otherwise, while at least half the limit is in use, it grows by about one per
+    limit's worth of calls. Callers over the limit are turned away instead of queued.
+    
+    The baseline is the lowest mean latency of a window of calls so far. A window that had to back
+    off measured the upstream's queue rather than the upstream, so it ends with a probe instead:
+    the limit drops to `min_limit` until that queue drains, the baseline is re-measured over
+    `probe_calls` calls, and the limit resumes at half its old value.
+    """
+    
+    def __init__(self, initial: int = UPSTREAM_LIMIT_INITIAL, min_limit: int = UPSTREAM_LIMIT_MIN,
+                 max_limit: int = UPSTREAM_LIMIT_MAX, tolerance: float = UPSTREAM_LIMIT_TOLERANCE,
+                 backoff: float = 0.9, window: int = 500, probe_calls: int = 10, slack: float = 0.005,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.probe_calls = probe_calls
+        self.slack = slack  # seconds of jitter never treated as queueing
+        self.clock = clock
+        self.inflight = 0
+        self.recent: Optional[float] = None
+        self.baseline = float("inf")
+        self.window_total = 0.0
+        self.samples = 0
+        self.congested = False
+        self.decreased_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.resume_limit = self.limit
+    
+    def acquire(self, shed: bool = True) -> bool:
+        """Take a slot; with `shed` a full limit counts as a shed lookup (hedges and retries are just not sent)"""
+        if self.inflight >= int(self.limit):
+            if shed:
+                UPSTREAM_SHED_TOTAL.inc()
+            return False
+        self.inflight += 1
+        return True
+    
+    def release(self, latency: float, failed: Optional[bool], timed_out: bool = False):
+        """Free a slot and adjust the limit; `failed` is None when the call produced no sample"""
+        self.inflight -= 1
+        if failed is None or failed and not timed_out:
+            return
+        now = self.clock()
+        if self.probe_started is not None:
+            # Only calls admitted after the probe began ran without our own queue ahead of them
+            if not failed and now - latency >= self.probe_started:
+                self.window_total += latency
+                self.samples += 1
+                if self.samples >= self.probe_calls:
+                    self.baseline = self.recent = self.window_total / self.samples
+                    self.window_total, self.samples = 0.0, 0
+                    self.limit, self.probe_started, self.decreased_at = self.resume_limit, None, now
+                    UPSTREAM_CONCURRENCY_LIMIT.set(self.limit)
+            return
         
-        # Valid military suffixes - includes Roman numerals I-IX only
-        self.VALID_NUMERIC_SUFFIXES = {'00', '01', '02', '03', '04', '05', '06', '07', '08', '09', '10', 
-                                     '11', '12', '13', '14', '15', '16', '17', '18', '19', '20',
-                                     '21', '22', '23', '24', '25', '26', '27', '28', '29', '30',
-                                     '31', '32', '33', '34', '35', '36', '37', '38', '39', '40',
-                                     '41', '42', '43', '44', '45', '46', '47', '48', '49', '50',
-                                     '51', '52', '53', '54', '55', '56', '57', '58', '59', '60',
-                                     '61', '62', '63', '64', '65', '66', '67', '68', '69', '70',
-                                     '71', '72', '73', '74', '75', '76', '77', '78', '79', '80',
-                                     '81', '82', '83', '84', '85', '86', '87', '88', '89', '90',
-                                     '91', '92', '93', '94', '95', '96', '97', '98', '99'}
-        
-        self.VALID_ROMAN_SUFFIXES = {'I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX'}
-        
-        # Enhanced military suffix mapping for old format conversion
-        self.military_suffix_mapping = {}
-        
-        # Map numeric suffixes (00-99) to appropriate institutions
-        for suffix in self.VALID_NUMERIC_SUFFIXES:
-            if suffix == '00':
-                self.military_suffix_mapping[suffix] = 'ZZT'  # TNI Headquarters
-            elif suffix in ['01', '02', '03', '04', '05']:
-                self.military_suffix_mapping[suffix] = 'ZZD'  # TNI Army
-            elif suffix in ['06', '07', '08']:
-                self.military_suffix_mapping[suffix] = 'ZZL'  # TNI Navy
-            elif suffix in ['09', '10', '11']:
-                self.military_suffix_mapping[suffix] = 'ZZU'  # TNI Air Force
-            elif suffix in ['12', '13', '14', '15']:
-                self.military_suffix_mapping[suffix] = 'ZZP'  # POLRI
+        if not failed:
+            self.recent = latency if self.recent is None else self.recent + 0.1 * (latency - self.recent)
+            self.window_total += latency
+            self.samples += 1
+        # Until the first window completes, the running mean (once it has a few calls) is the baseline
+        current = self.window_total / self.samples if self.samples >= 20 else float("inf")
+        if timed_out or self.recent > self.tolerance * min(self.baseline, current) + self.slack:
+            if now - self.decreased_at >= latency:
+                self.decreased_at = now
+                self.congested = True
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif (self.inflight + 1) * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        
+        if self.samples >= self.window:
+            if self.congested:
+                self.congested = False
+                self.resume_limit = max(self.min_limit, self.limit / 2)
+                self.limit, self.probe_started = self.min_limit, now
             else:
-                # Default other suffixes to TNI Army
-                self.military_suffix_mapping[suffix] = 'ZZD'
+                self.baseline = min(self.baseline, current)
+            self.window_total, self.samples = 0.0, 0
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.limit)
+
+class UpstreamStatusError(Exception):
+    """Firestore kept answering with a status other than 200 or 404"""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"Firestore returned {status_code}")
+        self.status_code = status_code
+
+class RegionSource(ABC):
+    """Where regions come from: look up one (prefix, suffix letter) key or iterate the whole table"""
+    
+    # Remote sources sit behind the region cache, single-flight and stale serving
+    remote = False
+    
+    async def startup(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    @abstractmethod
+    async def lookup(self, prefix: str, letter: str) -> Optional[Dict[str, Any]]:
+        """Return {"plate_region": {...}}, or None when the key does not exist"""
+    
+    @abstractmethod
+    def regions(self) -> AsyncIterator[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        """Yield ((prefix, letter), {"plate_region": {...}}) for every region"""
+
+class FirestoreRegionSource(RegionSource):
+    """Firestore REST documents at nopol/{prefix}/belakang/{letter}"""
+    
+    remote = True
+    
+    def __init__(self, base_url: str = FIRESTORE_BASE_URL, client: Optional[httpx.AsyncClient] = None):
+        self.base_url = base_url
+        
+        # Shared pooled client, created on startup and closed on shutdown
+        self.client = client
+        
+        # Region lookups get short budgets and fail fast while Firestore is unhealthy
+        self.breaker = CircuitBreaker()
+        self.region_timeout = httpx.Timeout(FIRESTORE_READ_TIMEOUT, connect=FIRESTORE_CONNECT_TIMEOUT)
+        self.attempt_latency = LatencyQuantile()  # the p95 of successful attempts is the hedge delay
+        self.retry_budget = RetryBudget()
+        self.upstream_attempts = FIRESTORE_ATTEMPTS
+        self.limit = AdaptiveConcurrencyLimit() if UPSTREAM_LIMIT_ENABLED else None
+    
+    async def startup(self):
+        # Set per worker: a value set at import would stay in the preloading master's livesum forever
+        if self.limit is not None:
+            UPSTREAM_CONCURRENCY_LIMIT.set(self.limit.limit)
+        if self.client is None:
+            self.client = create_upstream_client()
+            logger.info(
+                f"Upstream client ready: max_connections={FIRESTORE_MAX_CONNECTIONS}, "
+                f"max_keepalive={FIRESTORE_MAX_KEEPALIVE}, keepalive_expiry={FIRESTORE_KEEPALIVE_EXPIRY}s"
+            )
+    
+    async def shutdown(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+    
+    def get_client(self) -> httpx.AsyncClient:
+        # Lazily create the client when used outside the app lifespan (scripts, tests)
+        if self.client is None:
+            self.client = create_upstream_client()
+        return self.client
+    
+    async def _get_upstream(self, client: httpx.AsyncClient, url: str) -> httpx.Response:
+        """One instrumented Firestore GET with the short region-lookup budget"""
+        start = time.perf_counter()
+        UPSTREAM_INFLIGHT.inc()
+        try:
+            response = await client.get(url, timeout=self.region_timeout)
+        except Exception as e:
+            UPSTREAM_REQUESTS_TOTAL.labels(type(e).__name__).inc()
+            raise
+        finally:
+            UPSTREAM_INFLIGHT.dec()
+            UPSTREAM_DURATION.observe(time.perf_counter() - start)
+            UPSTREAM_POOL_CONNECTIONS.set(upstream_pool_size(client))
+        UPSTREAM_REQUESTS_TOTAL.labels(str(response.status_code)).inc()
+        # Only usable answers: timeouts and errors would pull the p95 onto the tail hedges are for
+        if not upstream_failed(response.status_code):
+            self.attempt_latency.add(time.perf_counter() - start)
+        return response
+    
+    async def lookup(self, prefix: str, letter: str) -> Optional[Dict[str, Any]]:
+        url = f"{self.base_url}/nopol/{prefix}/belakang/{letter}"
+        logger.debug("API URL: %s", url)
+        
+        if not self.breaker.allow():
+            UPSTREAM_REQUESTS_TOTAL.labels("circuit_open").inc()
+            raise UpstreamUnavailable(url)
+        
+        if self.limit is not None and not self.limit.acquire():
+            raise UpstreamOverloaded(url)
+        
+        client = self.get_client()
+        self.retry_budget.deposit()
+        extra = 0
+        
+        def may_add(hedge: bool) -> bool:
+            # Hedges and retries need budget; a hedge also needs a free slot under the limit,
+            # while a retry reuses the lookup's own slot once its attempts have finished
+            nonlocal extra
+            slot = hedge and self.limit is not None
+            if slot and not self.limit.acquire(shed=False):
+                return False
+            if not self.retry_budget.withdraw():
+                if slot:
+                    self.limit.release(0.0, None)
+                return False
+            extra += slot
+            return True
+        
+        start = time.perf_counter()
+        failed = None  # no latency sample if the lookup is cancelled
+        timed_out = False
+        try:
+            response = await hedged_get(lambda: self._get_upstream(client, url), self.attempt_latency.value,
+                                        self.upstream_attempts, may_add)
+            failed = upstream_failed(response.status_code)
+        except httpx.HTTPError as e:
+            failed, timed_out = True, isinstance(e, httpx.TimeoutException)
+            self.breaker.record_failure()
+            raise
+        finally:
+            if self.limit is not None:
+                self.limit.release(time.perf_counter() - start, failed, timed_out)
+                for _ in range(extra):
+                    self.limit.release(0.0, None)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        
+        if response.status_code == 200:
+            return self.format_response(response.json())
+        if response.status_code == 404:
+            return None
+        raise UpstreamStatusError(response.status_code)
+    
+    async def regions(self, page_size: int = 300) -> AsyncIterator[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        """Bulk-download every nopol/{prefix}/belakang/{letter} document"""
+        client = self.get_client()
+        async for prefix_doc in list_documents(client, f"{self.base_url}/nopol", page_size, show_missing=True):
+            prefix = prefix_doc["name"].rsplit("/", 1)[1]
+            async for region_doc in list_documents(client, f"{self.base_url}/nopol/{prefix}/belakang", page_size):
+                result = self.format_response(region_doc)
+                if "error" not in result:
+                    yield (prefix, region_doc["name"].rsplit("/", 1)[1]), result
+    
+    @staticmethod
+    def format_response(data: Dict[str, Any]) -> Dict[str, Any]:
+        if 'fields' not in data:
+            return {"error": "Invalid response format"}
+        
+        fields = data['fields']
+        return {
+            'plate_region': {
+                'province': fields.get('Provinsi', {}).get('stringValue', ''),
+                'city': fields.get('Daerah', {}).get('stringValue', ''),
+                'samsat_office': fields.get('Samsat', {}).get('stringValue', ''),
+                'address': fields.get('Alamat', {}).get('stringValue', '')
+            }
+        }
+
+class SQLiteRegionSource(RegionSource):
+    """Read-only local SQLite database with a regions(prefix, letter, ...) table, see write_region_sqlite"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.db = None
+    
+    def connect(self) -> "sqlite3.Connection":
+        if self.db is None:
+            import sqlite3
+            # Read-only; primary-key lookups are fast enough to run on the event loop
+            self.db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        return self.db
+    
+    async def startup(self):
+        count = self.connect().execute("SELECT COUNT(*) FROM regions").fetchone()[0]
+        logger.info(f"Region database opened: {count} entries from {self.path}")
+    
+    async def shutdown(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+    
+    async def lookup(self, prefix: str, letter: str) -> Optional[Dict[str, Any]]:
+        row = self.connect().execute(
+            "SELECT province, city, samsat_office, address FROM regions WHERE prefix = ? AND letter = ?",
+            (prefix, letter)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"plate_region": dict(zip(REGION_FIELDS, row))}
+    
+    async def regions(self) -> AsyncIterator[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        rows = self.connect().execute(
+            "SELECT prefix, letter, province, city, samsat_office, address FROM regions ORDER BY prefix, letter"
+        )
+        for row in rows:
+            yield (row[0], row[1]), {"plate_region": dict(zip(REGION_FIELDS, row[2:]))}
+
+class RegionTableSource(RegionSource):
+    """Memory-mapped read-only region table written by write_region_table; lookups are a binary search"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.table: Optional[mmap.mmap] = None
+        self.count = 0
+    
+    def open(self) -> mmap.mmap:
+        if self.table is None:
+            with open(self.path, "rb") as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = REGION_TABLE_HEADER.unpack_from(table, 0)
+            if magic != REGION_TABLE_MAGIC:
+                table.close()
+                raise ValueError(f"{self.path} is not a region table")
+            self.table, self.count = table, count
+        return self.table
+    
+    async def startup(self):
+        self.open()
+        logger.info(f"Region table mapped: {self.count} entries from {self.path}")
+    
+    async def shutdown(self):
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+    
+    def record(self, table: mmap.mmap, position: int) -> Dict[str, Any]:
+        _, offset, length = REGION_TABLE_RECORD.unpack_from(
+            table, REGION_TABLE_HEADER.size + position * REGION_TABLE_RECORD.size
+        )
+        fields = table[offset:offset + length].decode("utf-8").split("\x1f")
+        return {"plate_region": dict(zip(REGION_FIELDS, fields))}
+    
+    async def lookup(self, prefix: str, letter: str) -> Optional[Dict[str, Any]]:
+        key = region_table_key(prefix, letter)
+        if key is None:
+            return None
+        table = self.open()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = REGION_TABLE_HEADER.size + mid * REGION_TABLE_RECORD.size
+            probe = table[start:start + 4]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return self.record(table, mid)
+        return None
+    
+    async def regions(self) -> AsyncIterator[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        table = self.open()
+        for position in range(self.count):
+            start = REGION_TABLE_HEADER.size + position * REGION_TABLE_RECORD.size
+            key = table[start:start + 4]
+            yield (key[:3].rstrip(b"\0").decode("ascii"), key[3:].decode("ascii")), self.record(table, position)
+
+def create_region_source(kind: str = REGION_SOURCE, path: str = REGION_SOURCE_PATH,
+                         base_url: str = FIRESTORE_BASE_URL, client: Optional[httpx.AsyncClient] = None) -> RegionSource:
+    """Build the configured region source (REGION_SOURCE / REGION_SOURCE_PATH)"""
+    if kind == "firestore":
+        return FirestoreRegionSource(base_url, client)
+    if not path:
+        raise ValueError(f"REGION_SOURCE={kind} requires REGION_SOURCE_PATH")
+    if kind == "sqlite":
+        return SQLiteRegionSource(path)
+    if kind == "table":
+        return RegionTableSource(path)
+    raise ValueError(f"Unknown REGION_SOURCE: {kind}")
+
+class IndonesianPlateChecker:
+    def __init__(self, base_url: str = FIRESTORE_BASE_URL, client: Optional[httpx.AsyncClient] = None,
+                 region_cache: Optional[RegionCache] = None, source: Optional[RegionSource] = None):
+        # Where regions are resolved: Firestore by default, or a local database / table file
+        self.source = source if source is not None else create_region_source(base_url=base_url, client=client)
+        
+        # Region results keyed on (prefix, suffix letter); the keyspace is small and static
+        self.region_cache = region_cache if region_cache is not None else RegionCache()
         
-        # Map Roman numerals to TNI Army (traditional usage)
-        for roman in self.VALID_ROMAN_SUFFIXES:
-            self.military_suffix_mapping[roman] = 'ZZD'
+        # Concurrent misses for the same key share one upstream request
+        self.inflight = SingleFlight()
+        self._revalidating: Dict[Tuple[str, str], asyncio.Future] = {}
         
-        logger.info(f"Institution codes loaded: {self.institution_codes}")
-        logger.info(f"Valid numeric suffixes: {len(self.VALID_NUMERIC_SUFFIXES)} suffixes (00-99)")
-        logger.info(f"Valid Roman suffixes: {self.VALID_ROMAN_SUFFIXES}")
-        logger.info(f"Military suffix mapping loaded: {len(self.military_suffix_mapping)} mappings")
+        # Offline region index loaded from a snapshot file; answers lookups without network I/O
+        self.snapshot_path = REGION_SNAPSHOT_PATH
+        self.region_index: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._snapshot_task: Optional[asyncio.Task] = None
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self.region_index = load_region_snapshot(self.snapshot_path)
+            logger.info(f"Region snapshot loaded: {len(self.region_index)} entries from {self.snapshot_path}")
+        
+        # Known region prefixes/letters for correcting OCR misreads (OCR_FUZZY_MATCH)
+        self.fuzzy = OCR_FUZZY_MATCH
+        self.plate_index = PlateIndex.from_regions(self.region_index)
+        
+        # Shared module-level tables, kept as attributes for existing callers
+        self.institution_codes = INSTITUTION_CODES
+        self.VALID_NUMERIC_SUFFIXES = NUMERIC_SUFFIXES
+        self.VALID_ROMAN_SUFFIXES = ROMAN_SUFFIXES
+        self.military_suffix_mapping = MILITARY_SUFFIX_MAPPING
+    
+    async def startup(self):
+        """Open the region source (called from the app lifespan)"""
+        await self.source.startup()
+        if self.fuzzy and not self.region_index and not self.source.remote:
+            # Local sources list their regions in milliseconds; Firestore would be a full scan
+            self.plate_index = PlateIndex.from_regions(await self.download_region_snapshot())
+        if self.fuzzy and not self.plate_index and not (self.snapshot_path and REGION_SNAPSHOT_REFRESH > 0):
+            # Guessing at region codes would rewrite correctly read plates whose code is missing
+            logger.warning("OCR_FUZZY_MATCH needs known regions (REGION_SNAPSHOT_PATH or a local REGION_SOURCE), "
+                           "correction disabled")
+            self.fuzzy = False
+        if self.snapshot_path and REGION_SNAPSHOT_REFRESH > 0 and self._snapshot_task is None:
+            self._snapshot_task = asyncio.create_task(self._refresh_snapshot_loop(REGION_SNAPSHOT_REFRESH))
+    
+    async def shutdown(self):
+        """Stop background work and close the region source"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        for task in list(self._revalidating.values()):
+            task.cancel()
+        await self.source.shutdown()
+    
+    async def download_region_snapshot(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Read every (prefix, letter) region from the source into a region index"""
+        index = {}
+        async for key, result in self.source.regions():
+            index[key] = result
+        return index
+    
+    async def refresh_snapshot(self):
+        """Re-download the region table, swap the in-memory index and persist the snapshot"""
+        index = await self.download_region_snapshot()
+        if not index:
+            logger.warning("Region snapshot refresh returned no documents, keeping current index")
+            return
+        self.region_index = index
+        self.plate_index = PlateIndex.from_regions(index)
+        if self.snapshot_path:
+            save_region_snapshot(index, self.snapshot_path)
+        logger.info(f"Region snapshot refreshed: {len(index)} entries")
+    
+    async def _refresh_snapshot_loop(self, interval: float):
+        # Refresh right away when no snapshot exists yet, otherwise wait one interval
+        if self.region_index:
+            await asyncio.sleep(interval)
+        while True:
+            try:
+                await self.refresh_snapshot()
+            except Exception as e:
+                logger.error(f"Region snapshot refresh failed: {str(e)}")
+            await asyncio.sleep(interval)
     
     async def check_plate(self, plate_number: str) -> Dict[str, Any]:
-        logger.info(f"=== CHECKING PLATE: {plate_number} ===")
-        # Clean the plate number
-        plate_clean = plate_number.replace('-', '').replace(' ', '').upper()
+        logger.debug("CHECKING PLATE: %s", plate_number)
+        start = time.perf_counter()
+        parsed, correction = self.resolve(plate_number)
+        record_timing("classify", start)
+        log_context(plate_class=parsed.kind)
+        original = plate_number
+        if correction is not None:
+            plate_number = correction[0]
         
         # Check if it's an old military format from OCR
-        if self.is_old_military_format(plate_number):
-            return self.handle_old_military_plate(plate_number)
+        if parsed.kind == PLATE_OLD_MILITARY:
+            result = self.handle_old_military_plate(plate_number, parsed)
         # Check if it's a standard plate format that the database supports
-        elif self.is_standard_plate(plate_clean):
-            return await self.check_standard_plate(plate_clean)
+        elif parsed.kind == PLATE_STANDARD:
+            result = await self.check_standard_plate(parsed.clean, parsed)
         else:
-            return self.analyze_non_standard_plate(plate_number)
+            result = self.analyze_non_standard_plate(plate_number, parsed)
+        
+        if correction is not None:
+            # Copy: error results can be shared negative-cache entries
+            result = {**result, "ocr_correction": {
+                "original_plate": original, "corrected_plate": correction[0], "edits": correction[1]
+            }}
+        return result
+    
+    def resolve(self, plate_number: str) -> Tuple[ParsedPlate, Optional[Tuple[str, int]]]:
+        """Classify a plate; with fuzzy matching on, swap a misread plate for its best valid reading"""
+        parsed = self.classify(plate_number)
+        # Until a snapshot refresh fills the index there is nothing to correct against
+        if not self.fuzzy or not self.plate_index or self.plate_index.accepts(parsed):
+            return parsed, None
+        correction = self.plate_index.correct(plate_number)
+        if correction is None:
+            OCR_UNRESOLVED.inc()
+            return parsed, None
+        OCR_CORRECTED.inc()
+        logger.debug("OCR CORRECTION: %s -> %s (%d edits)", plate_number, correction[0], correction[1])
+        return self.classify(correction[0]), correction
+    
+    def classify(self, plate_number: str) -> ParsedPlate:
+        """Normalize a plate once and classify it in a single pass over the precompiled patterns"""
+        plate_spaced = plate_number.replace(' ', '').upper()
+        
+        match = OLD_MILITARY_PATTERN.match(plate_spaced)
+        if match:
+            return ParsedPlate(PLATE_OLD_MILITARY, plate_number, plate_spaced,
+                               number=match.group(1), military_suffix=match.group(2))
+        
+        plate_clean = plate_spaced.replace('-', '')
+        match = STANDARD_PLATE_PATTERN.match(plate_clean)
+        if match:
+            return ParsedPlate(PLATE_STANDARD, plate_number, plate_clean,
+                               prefix=match.group(1), middle=int(match.group(2)), suffix=match.group(3))
+        
+        return ParsedPlate(non_standard_kind(plate_clean), plate_number, plate_clean)
+    
+    async def check_plates(self, plates: List[str], concurrency: int = BATCH_CONCURRENCY) -> List[Dict[str, Any]]:
+        """Check many plates, resolving each unique upstream key once with bounded concurrency"""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        # Group unique plates by upstream key so each key takes one slot; later plates in a group hit the cache
+        groups: Dict[Any, List[str]] = {}
+        for plate in dict.fromkeys(plates):
+            groups.setdefault(self.upstream_key(plate) or plate, []).append(plate)
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        async def resolve(group: List[str]):
+            async with semaphore:
+                for plate in group:
+                    try:
+                        results[plate] = await self.check_plate(plate)
+                    except UpstreamOverloaded:
+                        results[plate] = {"error": OVERLOADED_ERROR}
+                    except Exception as e:
+                        logger.error(f"Batch item error: {str(e)}")
+                        results[plate] = {"error": "Service error"}
+        
+        await asyncio.gather(*(resolve(group) for group in groups.values()))
+        return [results[plate] for plate in plates]
+    
+    async def check_plate_stream(self, plates: AsyncIterable[Tuple[int, str]],
+                                 window: int = STREAM_WINDOW) -> AsyncIterator[Tuple[int, str, Dict[str, Any]]]:
+        """Yield (line, plate, result) for (line, plate) input as plates resolve, keeping at most `window` in flight
+        
+        Input is only pulled when a slot frees up, so memory stays bounded and a slow consumer
+        slows down reading instead of buffering results.
+        """
+        source = plates.__aiter__()
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        line_no, plate = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._check_numbered(line_no, plate)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _check_numbered(self, line_no: int, plate: str) -> Tuple[int, str, Dict[str, Any]]:
+        try:
+            return line_no, plate, await self.check_plate(PlateRequest(plate=plate).plate)
+        except ValueError:
+            return line_no, plate, {"error": "Invalid plate format"}
+        except UpstreamOverloaded:
+            return line_no, plate, {"error": OVERLOADED_ERROR}
+        except Exception as e:
+            logger.error(f"Stream item error: {str(e)}")
+            return line_no, plate, {"error": "Service error"}
+    
+    def upstream_key(self, plate_number: str) -> Optional[Tuple[str, str]]:
+        """Return the (prefix, suffix letter) upstream key for a plate, or None when no lookup is needed"""
+        parsed = self.classify(plate_number)
+        if parsed.kind != PLATE_STANDARD:
+            return None
+        return parsed.prefix, parsed.suffix[-1]
     
     def is_old_military_format(self, plate: str) -> bool:
         """Check if plate matches old military format from OCR: XXXXX-XX, XXXX-XX, XXXXX-X, or XXXX-X"""
-        plate_clean = plate.replace(' ', '').upper()
-        
-        # Check for numeric suffixes (00-99)
-        numeric_pattern = r'^(\d{4,5})-(\d{2})$'  # 4 or 5 digits + 2 digit suffix
-        numeric_match = re.match(numeric_pattern, plate_clean)
-        if numeric_match:
-            suffix = numeric_match.group(2)
-            if suffix in self.VALID_NUMERIC_SUFFIXES:
-                logger.info(f"DETECTED OLD MILITARY FORMAT (NUMERIC): {plate_clean}")
-                return True
-        
-        # Check for Roman numeral suffixes (I-IX)
-        roman_pattern = r'^(\d{4,5})-(I|II|III|IV|V|VI|VII|VIII|IX)$'  # 4 or 5 digits + Roman numeral
-        roman_match = re.match(roman_pattern, plate_clean)
-        if roman_match:
-            suffix = roman_match.group(2)
-            if suffix in self.VALID_ROMAN_SUFFIXES:
-                logger.info(f"DETECTED OLD MILITARY FORMAT (ROMAN): {plate_clean}")
-                return True
-        
-        return False
+        return OLD_MILITARY_PATTERN.match(plate.replace(' ', '').upper()) is not None
     
-    def handle_old_military_plate(self, plate: str) -> Dict[str, Any]:
+    def handle_old_military_plate(self, plate: str, parsed: Optional[ParsedPlate] = None) -> Dict[str, Any]:
         """Convert old military format to analyzable format and provide detailed info"""
-        plate_clean = plate.replace(' ', '').upper()
-        logger.info(f"PROCESSING OLD MILITARY PLATE: {plate_clean}")
-        
-        # Extract number and suffix
-        if '-' in plate_clean:
-            number_part, suffix_part = plate_clean.split('-', 1)
+        if parsed is not None and parsed.kind == PLATE_OLD_MILITARY:
+            # Already validated by classify()
+            number_part, suffix_part = parsed.number, parsed.military_suffix
+            logger.debug("PROCESSING OLD MILITARY PLATE: %s", parsed.clean)
         else:
-            return {"error": "Invalid military plate format"}
+            plate_clean = plate.replace(' ', '').upper()
+            logger.debug("PROCESSING OLD MILITARY PLATE: %s", plate_clean)
+            
+            # Extract number and suffix
+            if '-' in plate_clean:
+                number_part, suffix_part = plate_clean.split('-', 1)
+            else:
+                return {"error": "Invalid military plate format"}
         
         # Validate number part (must be 4 or 5 digits)
-        if not re.match(r'^\d{4,5}$', number_part):
+        if not MILITARY_NUMBER_PATTERN.match(number_part):
             return {
                 "error": f"Invalid number format: {number_part}",
                 "note": "Nomor kendaraan harus 4 atau 5 digit"
             }
         
-        # Validate suffix part
-        if suffix_part not in self.VALID_NUMERIC_SUFFIXES and suffix_part not in self.VALID_ROMAN_SUFFIXES:
+        # Validate suffix part and map it to an institution
+        institution_code = MILITARY_SUFFIX_MAPPING.get(suffix_part)
+        if institution_code is None:
             return {
                 "error": f"Invalid military suffix: {suffix_part}",
                 "note": f"Suffix harus berupa angka 00-99 atau angka Romawi I-IX",
@@ -239,21 +1886,13 @@ class IndonesianPlateChecker:
                 }
             }
         
-        # Map suffix to institution
-        institution_code = self.military_suffix_mapping.get(suffix_part)
-        institution_name = self.institution_codes.get(institution_code) if institution_code else None
-        
-        if not institution_name:
-            return {
-                "error": f"Unknown military suffix mapping: {suffix_part}",
-                "note": "Suffix tidak dapat dipetakan ke institusi yang dikenal"
-            }
+        institution_name = INSTITUTION_CODES[institution_code]
         
         # Determine vehicle type based on number (military classification)
         vehicle_type = self.get_military_vehicle_type(number_part)
         
         # Determine suffix type
-        suffix_type = "Angka Romawi" if suffix_part in self.VALID_ROMAN_SUFFIXES else "Numerik"
+        suffix_type = "Angka Romawi" if suffix_part in ROMAN_SUFFIXES else "Numerik"
         
         # Create comprehensive response for old military plates
         result = {
@@ -271,7 +1910,7 @@ class IndonesianPlateChecker:
             }
         }
         
-        logger.info(f"OLD MILITARY RESULT: {result}")
+        logger.debug("OLD MILITARY RESULT: %s", result)
         return result
     
     def get_military_vehicle_type(self, number_part: str) -> str:
@@ -280,68 +1919,125 @@ class IndonesianPlateChecker:
     
     def is_standard_plate(self, plate_clean: str) -> bool:
         # Check if it matches XX-XXXX-XXX format (without hyphens: XXXXXXXX)
-        pattern = r'^[A-Z]+\d+[A-Z]+$'
-        return bool(re.match(pattern, plate_clean))
+        return STANDARD_PLATE_PATTERN.match(plate_clean) is not None
     
-    async def check_standard_plate(self, plate_clean: str) -> Dict[str, Any]:
-        prefix, middle, suffix = self.parse_standard_plate(plate_clean)
-        logger.info(f"PARSED: prefix={prefix}, middle={middle}, suffix={suffix}")
+    async def check_standard_plate(self, plate_clean: str, parsed: Optional[ParsedPlate] = None) -> Dict[str, Any]:
+        if parsed is not None and parsed.kind == PLATE_STANDARD:
+            prefix, middle, suffix = parsed.prefix, parsed.middle, parsed.suffix
+        else:
+            prefix, middle, suffix = self.parse_standard_plate(plate_clean)
+        logger.debug("PARSED: prefix=%s, middle=%s, suffix=%s", prefix, middle, suffix)
         
         if not prefix or middle is None or not suffix:
             return {"error": "Invalid standard plate format"}
         
         # Use only the last letter of suffix for API call (as per original logic)
         suffix_for_api = suffix[-1]
-        url = f"{self.base_url}/nopol/{prefix}/belakang/{suffix_for_api}"
-        logger.info(f"API URL: {url}")
         
         try:
-            async with httpx.AsyncClient(timeout=20.0) as client:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    result = self.format_response(response.json())
-                    if "error" not in result:
-                        # Create plate_analysis with exact order as a regular dict
-                        plate_analysis = {}
-                        plate_analysis["kode_wilayah"] = prefix
-                        plate_analysis["nomor_identitas_polisi"] = middle
-                        plate_analysis["kode_khusus"] = suffix
-                        
-                        # Build final response as regular dict
-                        ordered_result = {}
-                        ordered_result["status"] = "Plat sudah terdaftar"
-                        ordered_result["jenis_kendaraan"] = self.get_vehicle_type(middle)
-                        ordered_result["jenis_plat_nomor"] = self.get_plate_type(suffix)
-                        
-                        # CRITICAL: Add institution field
-                        institution_name = self.get_institution_name(suffix)
-                        logger.info(f"INSTITUTION CHECK: suffix='{suffix}' -> institution='{institution_name}'")
-                        
-                        if institution_name:
-                            ordered_result["institution"] = institution_name
-                            logger.info(f"ADDED INSTITUTION FIELD: {institution_name}")
-                        else:
-                            logger.info("NO INSTITUTION FOUND")
-                        
-                        ordered_result["plate_analysis"] = plate_analysis
-                        ordered_result["plate_region"] = result["plate_region"]
-                        
-                        logger.info(f"FINAL RESULT KEYS: {list(ordered_result.keys())}")
-                        return ordered_result
-                    return result
-                else:
-                    return {"error": f"Plate not found: {response.status_code}"}
+            start = time.perf_counter()
+            result = await self.fetch_region(prefix, suffix_for_api)
+            record_timing("region", start)
+            if "error" not in result:
+                # Create plate_analysis with exact order as a regular dict
+                plate_analysis = {}
+                plate_analysis["kode_wilayah"] = prefix
+                plate_analysis["nomor_identitas_polisi"] = middle
+                plate_analysis["kode_khusus"] = suffix
+                
+                # Build final response as regular dict
+                ordered_result = {}
+                ordered_result["status"] = "Plat sudah terdaftar"
+                ordered_result["jenis_kendaraan"] = self.get_vehicle_type(middle)
+                ordered_result["jenis_plat_nomor"] = self.get_plate_type(suffix)
+                
+                # CRITICAL: Add institution field
+                institution_name = self.get_institution_name(suffix)
+                logger.debug("INSTITUTION CHECK: suffix=%r -> institution=%r", suffix, institution_name)
+                
+                if institution_name:
+                    ordered_result["institution"] = institution_name
+                
+                ordered_result["plate_analysis"] = plate_analysis
+                ordered_result["plate_region"] = result["plate_region"]
+
+                return ordered_result
+            return result
         except httpx.TimeoutException:
             logger.error("External API timeout")
             return {"error": "Service temporarily unavailable"}
+        except UpstreamUnavailable:
+            logger.debug("Upstream circuit open, failing fast")
+            return {"error": "Service temporarily unavailable"}
+        except UpstreamOverloaded:
+            raise
         except Exception as e:
-            logger.error(f"External API error: {str(e)}")
+            logger.error("External API error: %s", e)
             return {"error": "Service error"}
     
+    async def fetch_region(self, prefix: str, suffix_for_api: str) -> Dict[str, Any]:
+        """Resolve the region document for (prefix, suffix letter), served from cache when possible"""
+        key = (prefix, suffix_for_api)
+        indexed = self.region_index.get(key)
+        if indexed is not None:
+            CACHE_INDEX_HIT.inc()
+            log_context(cache="index")
+            return indexed
+        
+        if not self.source.remote:
+            # Local sources answer in microseconds; caching them would only duplicate the data
+            log_context(cache="local")
+            result = await self.source.lookup(prefix, suffix_for_api)
+            return result if result is not None else {"error": "Plate not found: 404"}
+        
+        cached = self.region_cache.get(key)
+        if cached is not None:
+            log_context(cache="hit")
+            return cached
+        
+        stale = self.region_cache.get_stale(key)
+        if stale is not None:
+            log_context(cache="stale")
+            self.revalidate(prefix, suffix_for_api)
+            return stale
+        
+        start = time.perf_counter()
+        try:
+            return await self.inflight.do(key, lambda: self._fetch_region_upstream(prefix, suffix_for_api))
+        finally:
+            log_context(cache="miss", upstream_ms=round((time.perf_counter() - start) * 1000, 2))
+    
+    def revalidate(self, prefix: str, suffix_for_api: str):
+        """Refresh a stale region in the background, at most one refresh per key at a time"""
+        key = (prefix, suffix_for_api)
+        if key in self._revalidating:
+            return
+        task = asyncio.ensure_future(self.inflight.do(key, lambda: self._fetch_region_upstream(prefix, suffix_for_api)))
+        self._revalidating[key] = task
+        task.add_done_callback(lambda t: self._revalidated(key, t))
+    
+    def _revalidated(self, key, task: asyncio.Future):
+        self._revalidating.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Background refresh of %s failed: %s", key, task.exception())
+    
+    async def _fetch_region_upstream(self, prefix: str, suffix_for_api: str) -> Dict[str, Any]:
+        key = (prefix, suffix_for_api)
+        try:
+            result = await self.source.lookup(prefix, suffix_for_api)
+        except UpstreamStatusError as e:
+            return {"error": f"Plate not found: {e.status_code}"}
+        
+        if result is None:
+            result = {"error": "Plate not found: 404"}
+            self.region_cache.set(key, result, negative=True)
+        elif "error" not in result:
+            self.region_cache.set(key, result)
+        return result
+    
     def parse_standard_plate(self, plate_clean: str):
         # Parse XXXXXXXX format (e.g., B1234ABC -> B, 1234, ABC)
-        pattern = r'^([A-Z]+)(\d+)([A-Z]+)$'
-        match = re.match(pattern, plate_clean)
+        match = STANDARD_PLATE_PATTERN.match(plate_clean)
         if match:
             prefix = match.group(1)
             middle = int(match.group(2))
@@ -350,35 +2046,22 @@ class IndonesianPlateChecker:
         return None, None, None
     
     def get_vehicle_type(self, middle_number: int) -> str:
-        if 1 <= middle_number <= 1999:
-            return "Mobil Penumpang"
-        elif 2000 <= middle_number <= 6999:
-            return "Sepeda Motor"
-        elif 7000 <= middle_number <= 7999:
-            return "Mobil Bus"
-        elif 8000 <= middle_number <= 8999:
-            return "Mobil Barang"
-        elif 9000 <= middle_number <= 9999:
-            return "Kendaraan Khusus"
-        else:
-            return "Tidak Diketahui"
+        return vehicle_type(middle_number)
     
     def get_plate_type(self, suffix: str) -> str:
-        if suffix in self.institution_codes:
-            return "Dinas TNI dan POLRI" 
-        else:
-            return "Sipil"
+        return "Dinas TNI dan POLRI" if suffix in INSTITUTION_CODES else "Sipil"
     
     def get_institution_name(self, suffix: str) -> Optional[str]:
-        result = self.institution_codes.get(suffix, None)
-        logger.info(f"get_institution_name('{suffix}') = '{result}'")
-        return result
+        return INSTITUTION_CODES.get(suffix)
     
-    def analyze_non_standard_plate(self, plate: str) -> Dict[str, Any]:
-        plate_upper = plate.upper().replace('-', '').replace(' ', '')
+    def analyze_non_standard_plate(self, plate: str, parsed: Optional[ParsedPlate] = None) -> Dict[str, Any]:
+        if parsed is not None:
+            kind = parsed.kind
+        else:
+            kind = non_standard_kind(plate.upper().replace('-', '').replace(' ', ''))
         
         # State agency: RI format
-        if re.match(r'^RI\d*$', plate_upper):
+        if kind == PLATE_STATE:
             return {
                 "message": "Format plat dinas negara tidak didukung oleh database",
                 "jenis_plat_nomor": "Dinas Pemerintah", 
@@ -386,7 +2069,7 @@ class IndonesianPlateChecker:
             }
         
         # Diplomatic: CC/CD/CN/CS format
-        elif re.match(r'^(CC|CD|CN|CS)\d*$', plate_upper):
+        elif kind == PLATE_DIPLOMATIC:
             return {
                 "message": "Format plat diplomatik tidak didukung oleh database", 
                 "jenis_plat_nomor": "Diplomatik",
@@ -398,29 +2081,68 @@ class IndonesianPlateChecker:
     
     def parse_plate(self, plate: str):
         # Legacy method for backward compatibility
-        pattern = r'^([A-Z]+)\d+([A-Z]+)$'
-        match = re.match(pattern, plate.upper())
+        match = STANDARD_PLATE_PATTERN.match(plate.upper())
         if match:
-            return match.group(1), match.group(2)[-1]
+            return match.group(1), match.group(3)[-1]
         return None, None
     
     def format_response(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        if 'fields' not in data:
-            return {"error": "Invalid response format"}
-        
-        fields = data['fields']
-        return {
-            'plate_region': {
-                'province': fields.get('Provinsi', {}).get('stringValue', ''),
-                'city': fields.get('Daerah', {}).get('stringValue', ''),
-                'samsat_office': fields.get('Samsat', {}).get('stringValue', ''),
-                'address': fields.get('Alamat', {}).get('stringValue', '')
-            }
-        }
+        # Legacy method for backward compatibility
+        return FirestoreRegionSource.format_response(data)
 
 # Initialize the checker
 checker = IndonesianPlateChecker()
 
+class TokenCache:
+    """Bounded TTL/LRU cache of verified JWTs (token digest -> user), capped at the token's exp"""
+    
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # digest -> (expires_at, user)
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user
+    
+    def set(self, key, user, exp: Optional[float] = None):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        self._entries[key] = (expires_at, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+token_cache = TokenCache()
+ZEABUR_TOKEN_BYTES = ZEABUR_BEARER_TOKEN.encode()
+ZEABUR_USER = {"username": "zeabur_user"}
+DEVELOPER_USER = {"username": "developer"}
+
 # Authentication functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -435,18 +2157,32 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify JWT token from Authorization header"""
+    start = time.perf_counter()
+    try:
+        return authenticate(credentials.credentials)
+    finally:
+        record_timing("auth", start)
+
+def authenticate(token: str) -> dict:
+    """Resolve a bearer token to its user, raising 401 when it is invalid"""
     try:
-        # Check if using Zeabur bearer token
-        if credentials.credentials == ZEABUR_BEARER_TOKEN:
-            return {"username": "zeabur_user"}
+        # Check if using Zeabur bearer token (constant time)
+        token_bytes = token.encode()
+        if hmac.compare_digest(token_bytes, ZEABUR_TOKEN_BYTES):
+            return ZEABUR_USER
         
         # For development/testing, you can use a simple static token
-        if os.getenv("ENVIRONMENT") == "development" and credentials.credentials == "dev-token":
-            return {"username": "developer"}
-            
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        if ENVIRONMENT == "development" and hmac.compare_digest(token_bytes, b"dev-token"):
+            return DEVELOPER_USER
+        
+        key = TokenCache.key(token)
+        user = token_cache.get(key)
+        if user is not None:
+            return user
+        
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
@@ -454,7 +2190,10 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
                 detail="Invalid authentication credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return {"username": username}
+        user = {"username": username}
+        exp = payload.get("exp")
+        token_cache.set(key, user, exp=float(exp) if exp is not None else None)
+        return user
     except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -471,6 +2210,15 @@ async def validation_exception_handler(request: Request, exc):
         content={"error": "Invalid input format"}
     )
 
+# Region lookups shed by the adaptive concurrency limit
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded_handler(request: Request, exc: UpstreamOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"error": OVERLOADED_ERROR},
+        headers={"Retry-After": str(UPSTREAM_RETRY_AFTER)}
+    )
+
 # Global exception handler for error sanitization
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -480,9 +2228,42 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"error": "Internal server error"}
     )
 
+def result_max_age(result: Dict[str, Any]) -> int:
+    """Seconds a GET /check-plate result may be reused; 0 when it must not be"""
+    if "ocr_correction" in result:
+        return 0  # a best guess that echoes the raw read
+    if "plate_region" in result:
+        return RESULT_CACHE_MAX_AGE
+    return STATIC_RESULT_CACHE_MAX_AGE  # military and special plates never change
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def cacheable_response(request: Request, result: Dict[str, Any]) -> Response:
+    """Result with ETag and Cache-Control headers, or a bodiless 304 when the client's copy is current"""
+    response = FastJSONResponse(result)
+    max_age = result_max_age(result)
+    if max_age <= 0:
+        return response
+    headers = {
+        "ETag": '"%s"' % hashlib.blake2b(response.body, digest_size=12).hexdigest(),
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "Authorization",
+        # Read and stripped by nginx, whose cache is keyed per token; other shared caches see "private"
+        "X-Accel-Expires": str(max_age),
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
 # Routes
 @app.get("/check-plate")
-@limiter.limit("100/minute")
+@rate_limit()
 async def check_plate_get(
     request: Request,
     plate: str,
@@ -502,13 +2283,13 @@ async def check_plate_get(
                 detail="Plat tidak terdaftar"
             )
         
-        return result
+        return cacheable_response(request, result)
     except ValueError as e:
         logger.warning(f"Invalid plate format: {plate}")
         raise HTTPException(status_code=400, detail="Invalid plate format")
 
 @app.post("/check-plate")
-@limiter.limit("100/minute")
+@rate_limit()
 async def check_plate_post(
     request: Request,
     plate_request: PlateRequest,
@@ -525,71 +2306,388 @@ async def check_plate_post(
                 detail="Plat nomor tidak terdaftar"
             )
         
-        return result
+        return FastJSONResponse(result)
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         logger.error(f"Error processing plate request: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def batch_item(plate: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if result.get("error") == OVERLOADED_ERROR:
+        return {"plate": plate, "status_code": 503, "error": OVERLOADED_ERROR}
+    if "error" in result and "Format plat militer lama terdeteksi" not in result.get("status", ""):
+        return {"plate": plate, "status_code": 404, "error": "Plat nomor tidak terdaftar"}
+    return {"plate": plate, "status_code": 200, "result": result}
+
+@app.post("/check-plates")
+@rate_limit()
+async def check_plates_post(
+    request: Request,
+    batch_request: PlateBatchRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Check up to BATCH_MAX_PLATES plates in one request; results keep input order"""
+    # Every BATCH_PLATES_PER_HIT plates count as one request; the decorator paid for the first ones
+    due = -(-len(batch_request.plates) // BATCH_PLATES_PER_HIT) - 1
+    if due > 0:
+        exceeded = limiter.charge(request, check_plates_post, cost=due)
+        if exceeded:
+            return FastJSONResponse({"error": f"Rate limit exceeded: {exceeded}"}, status_code=429)
+    
+    items: List[Optional[Dict[str, Any]]] = [None] * len(batch_request.plates)
+    valid_plates = []
+    valid_positions = []
+    for i, plate in enumerate(batch_request.plates):
+        try:
+            valid_plates.append(PlateRequest(plate=plate).plate)
+            valid_positions.append(i)
+        except ValueError:
+            items[i] = {"plate": plate, "status_code": 400, "error": "Invalid plate format"}
+    
+    # Summarize the batch in the request log; per-plate details would overwrite each other
+    log_context(plate_class="batch", plates=len(items))
+    request_log_context.set(None)
+    request_timings.set(None)
+    
+    results = await checker.check_plates(valid_plates)
+    for i, plate, result in zip(valid_positions, valid_plates, results):
+        items[i] = batch_item(batch_request.plates[i], result)
+    
+    return FastJSONResponse({"count": len(items), "results": items})
+
+async def iter_plate_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Split a newline-delimited byte stream into (1-based line number, plate), skipping blank lines"""
+    buffer = b""
+    line_no = 0
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            if skipping:
+                # End of a truncated line, already numbered
+                skipping = False
+                continue
+            line_no += 1
+            plate = line[:STREAM_MAX_LINE].decode("utf-8", "replace").strip()
+            if plate:
+                yield line_no, plate
+        if len(buffer) > STREAM_MAX_LINE and not skipping:
+            # Bound memory on lines without a newline; the truncated plate fails validation
+            line_no += 1
+            yield line_no, buffer[:STREAM_MAX_LINE].decode("utf-8", "replace").strip()
+            buffer = b""
+            skipping = True
+        elif skipping:
+            buffer = b""
+    plate = buffer[:STREAM_MAX_LINE].decode("utf-8", "replace").strip()
+    if plate and not skipping:
+        yield line_no + 1, plate
+
+async def ndjson_results(results: AsyncIterator[Tuple[int, str, Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    async for line_no, plate, result in results:
+        item = {"index": line_no}
+        if result.get("error") == "Invalid plate format":
+            item.update({"plate": plate, "status_code": 400, "error": "Invalid plate format"})
+        else:
+            item.update(batch_item(plate, result))
+        yield json_bytes(item) + b"\n"
+
+@app.post("/check-plates/stream")
+@rate_limit()
+async def check_plates_stream(
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    """Check a newline-delimited list of plates, streaming NDJSON results as they resolve"""
+    log_context(plate_class="stream")
+    request_log_context.set(None)
+    request_timings.set(None)
+    
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > STREAM_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Request body too large")
+    
+    # StreamingResponse consumes receive() to watch for disconnects once the response has
+    # started, so the upload is spooled first (spilling to disk past STREAM_SPOOL_SIZE).
+    # Like a batch, every BATCH_PLATES_PER_HIT lines count as one request; the decorator
+    # paid for the first ones, the rest are charged as the lines arrive.
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE)
+    size = newlines = charged = 0
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        size += len(chunk)
+        if size > STREAM_MAX_BYTES:
+            spool.close()
+            raise HTTPException(status_code=413, detail="Request body too large")
+        spool.write(chunk)
+        newlines += chunk.count(b"\n")
+        lines = newlines + (not chunk.endswith(b"\n"))
+        due = -(-lines // BATCH_PLATES_PER_HIT) - 1 - charged
+        if due > 0:
+            exceeded = limiter.charge(request, check_plates_stream, cost=due)
+            if exceeded:
+                spool.close()
+                return FastJSONResponse({"error": f"Rate limit exceeded: {exceeded}"}, status_code=429)
+            charged += due
+    spool.seek(0)
+    
+    async def read_spool():
+        try:
+            while True:
+                chunk = spool.read(64 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            spool.close()
+    
+    results = checker.check_plate_stream(iter_plate_lines(read_spool()))
+    return StreamingResponse(ndjson_results(results), media_type="application/x-ndjson")
+
+async def gate_result(raw, exceeded: Optional[str] = None) -> str:
+    """Answer one gate message `{"id": ..., "plate": ...}` with the plate result tagged by the same id
+    
+    `exceeded` is the rate limit the connection is over, if any; the plate is then not looked up.
+    """
+    start = time.perf_counter()
+    try:
+        if len(raw) > GATE_MAX_MESSAGE:
+            raise ValueError("message too long")
+        message = json.loads(raw)
+        correlation_id, plate = message.get("id"), message["plate"]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        item = {"id": None, "status_code": 400, "error": "Invalid message"}
+    else:
+        if exceeded is not None:
+            item = {"id": correlation_id, "plate": plate, "status_code": 429, "error": f"Rate limit exceeded: {exceeded}"}
+        else:
+            try:
+                item = {"id": correlation_id, **batch_item(plate, await checker.check_plate(PlateRequest(plate=plate).plate))}
+            except ValueError:
+                item = {"id": correlation_id, "plate": plate, "status_code": 400, "error": "Invalid plate format"}
+            except UpstreamOverloaded:
+                item = {"id": correlation_id, "plate": plate, "status_code": 503, "error": OVERLOADED_ERROR}
+            except Exception as e:
+                logger.error(f"Gate feed item error: {str(e)}")
+                item = {"id": correlation_id, "plate": plate, "status_code": 500, "error": "Service error"}
+    REQUESTS_TOTAL.labels("/ws/gate", request_outcome(item["status_code"], None)).inc()
+    REQUEST_DURATION.labels("/ws/gate").observe(time.perf_counter() - start)
+    return json_bytes(item).decode()
+
+async def serve_gate(websocket: WebSocket, window: int = GATE_WINDOW):
+    """Pump a gate connection: read while fewer than `window` plates are in flight, send results as they resolve
+    
+    With the window full nothing is read, so a gate that outpaces the lookups is slowed
+    down by the WebSocket's own TCP flow control instead of queueing reads here. Like a
+    batch, every BATCH_PLATES_PER_HIT plates count as one request against the rate limits;
+    the handshake paid for the first ones.
+    """
+    pending = set()
+    receiving = None
+    allowance = BATCH_PLATES_PER_HIT
+    exceeded = None
+    try:
+        while True:
+            if receiving is None and len(pending) < window:
+                receiving = asyncio.ensure_future(websocket.receive())
+            waiting = pending | {receiving} if receiving is not None else pending
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is receiving:
+                    receiving = None
+                    message = task.result()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    raw = message.get("text")
+                    if allowance == 0:
+                        exceeded = limiter.charge(websocket, gate_feed)
+                        allowance = 0 if exceeded else BATCH_PLATES_PER_HIT
+                    if not exceeded:
+                        allowance -= 1
+                    raw = raw if raw is not None else message.get("bytes", b"")
+                    pending.add(asyncio.ensure_future(gate_result(raw, exceeded)))
+                else:
+                    pending.discard(task)
+                    await websocket.send_text(task.result())
+    finally:
+        for task in pending:
+            task.cancel()
+        if receiving is not None:
+            receiving.cancel()
+
+@app.websocket("/ws/gate")
+async def gate_feed(websocket: WebSocket):
+    """Persistent gate channel: authenticate once, then stream plate reads and receive results by id"""
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    try:
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        authenticate(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if limiter.charge(websocket, gate_feed):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    
+    await websocket.accept()
+    GATE_CONNECTIONS.inc()
+    try:
+        await serve_gate(websocket)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        GATE_CONNECTIONS.dec()
+
+# Static payloads, serialized once at import
+HOME_PAYLOAD = json_bytes({
+    "message": "Indonesian Plate Checker API with Institution Support & OCR Military Compatibility",
+    "version": "2.0.0",
+    "security_features": [
+        "Bearer token authentication",
+        "Rate limiting (100 requests/minute)",
+        "Input validation", 
+        "Security headers",
+        "Request timeouts",
+        "Error sanitization"
+    ],
+    "database_support": "Mendukung format plat standar Indonesia (XX-XXXX-XXX) dan format militer lama dari OCR",
+    "supported_formats": {
+        "standard": "XX-XXXX-XXX (e.g., B-1234-ABC, D-5678-ZZP)",
+        "old_military": "XXXXX-XX atau XXXX-X (e.g., 12345-00, 1234-V)"
+    },
+    "features": {
+        "vehicle_classification": "Berdasarkan nomor identitas polisi (1-1999: Mobil Penumpang, 2000-6999: Sepeda Motor, 7000-7999: Mobil Bus, 8000-8999: Mobil Barang, 9000-9999: Kendaraan Khusus)",
+        "plate_type": "Sipil atau Institusi (ZZT/ZZU/ZZD/ZZL/ZZP/ZZH)",
+        "region_info": "Informasi provinsi, kota, kantor Samsat, dan alamat",
+        "military_support": "Deteksi dan analisis plat militer format lama dengan mapping institusi"
+    },
+    "military_suffix_codes": {
+        "00": "Markas Besar TNI",
+        "01": "TNI AD (Army)",
+        "02": "TNI AL (Navy)", 
+        "09": "TNI AU (Air Force)",
+        "10": "POLRI (Police)",
+        "I-IX": "TNI AD (Roman numerals)"
+    },
+    "authentication": {
+        "type": "Bearer Token",
+        "header": "Authorization: Bearer <token>",
+        "note": "All endpoints require valid JWT token or configured bearer token",
+        "zeabur_config": "Set ZEABUR_BEARER_TOKEN environment variable"
+    },
+    "endpoints": {
+        "GET /check-plate?plate=B1234ABC": "Check standard plate via query parameter",
+        "GET /check-plate?plate=12345-00": "Check old military plate via query parameter",
+        "POST /check-plate": "Check plate via JSON body {'plate': 'B1234ABC' or '12345-00'}",
+        "POST /check-plates": f"Check up to {BATCH_MAX_PLATES} plates via JSON body {{'plates': ['B1234ABC', '12345-00']}}",
+        "POST /check-plates/stream": "Check a newline-delimited plate list, results streamed as NDJSON",
+        "WS /ws/gate": "Persistent gate feed: send {'id': ..., 'plate': ...}, results come back tagged by id",
+        "GET /health": "Liveness probe, no authentication"
+    }
+})
+HEALTH_PAYLOAD = json_bytes({"status": "ok"})
+
 @app.get("/")
-@limiter.limit("100/minute")
+@rate_limit()
 async def home(request: Request):
     """API documentation and information"""
-    response_data = {
-        "message": "Indonesian Plate Checker API with Institution Support & OCR Military Compatibility",
-        "version": "2.0.0",
-        "security_features": [
-            "Bearer token authentication",
-            "Rate limiting (100 requests/minute)",
-            "Input validation", 
-            "Security headers",
-            "Request timeouts",
-            "Error sanitization"
-        ],
-        "database_support": "Mendukung format plat standar Indonesia (XX-XXXX-XXX) dan format militer lama dari OCR",
-        "supported_formats": {
-            "standard": "XX-XXXX-XXX (e.g., B-1234-ABC, D-5678-ZZP)",
-            "old_military": "XXXXX-XX atau XXXX-X (e.g., 12345-00, 1234-V)"
-        },
-        "features": {
-            "vehicle_classification": "Berdasarkan nomor identitas polisi (1-1999: Mobil Penumpang, 2000-6999: Sepeda Motor, 7000-7999: Mobil Bus, 8000-8999: Mobil Barang, 9000-9999: Kendaraan Khusus)",
-            "plate_type": "Sipil atau Institusi (ZZT/ZZU/ZZD/ZZL/ZZP/ZZH)",
-            "region_info": "Informasi provinsi, kota, kantor Samsat, dan alamat",
-            "military_support": "Deteksi dan analisis plat militer format lama dengan mapping institusi"
-        },
-        "military_suffix_codes": {
-            "00": "Markas Besar TNI",
-            "01": "TNI AD (Army)",
-            "02": "TNI AL (Navy)", 
-            "09": "TNI AU (Air Force)",
-            "10": "POLRI (Police)",
-            "I-IX": "TNI AD (Roman numerals)"
-        },
-        "authentication": {
-            "type": "Bearer Token",
-            "header": "Authorization: Bearer <token>",
-            "note": "All endpoints require valid JWT token or configured bearer token",
-            "zeabur_config": "Set ZEABUR_BEARER_TOKEN environment variable"
-        },
-        "endpoints": {
-            "GET /check-plate?plate=B1234ABC": "Check standard plate via query parameter",
-            "GET /check-plate?plate=12345-00": "Check old military plate via query parameter",
-            "POST /check-plate": "Check plate via JSON body {'plate': 'B1234ABC' or '12345-00'}"
-        }
-    }
-    return response_data
+    return Response(content=HOME_PAYLOAD, media_type="application/json")
+
+@app.get("/health")
+@limiter.exempt
+async def health():
+    """Liveness probe for container healthchecks; no auth, not rate limited"""
+    return Response(content=HEALTH_PAYLOAD, media_type="application/json")
+
+@app.get("/metrics")
+async def metrics(current_user: dict = Depends(verify_token)):
+    """Prometheus metrics, aggregated over all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        from prometheus_client import multiprocess
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(content=data, headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+def require_service_token(current_user: dict = Depends(verify_token)) -> dict:
+    """Admin endpoints accept only the ZEABUR_BEARER_TOKEN service token, not issued JWTs"""
+    if current_user is not ZEABUR_USER:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return current_user
+
+@app.post("/admin/profile")
+async def start_profile(requests: int = 100, current_user: dict = Depends(require_service_token)):
+    """Sample stacks for the next `requests` requests handled by this worker"""
+    if not 1 <= requests <= 100000:
+        raise HTTPException(status_code=400, detail="requests must be between 1 and 100000")
+    if not profiler.start(requests):
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    return {"status": "profiling", "requests": requests, "worker": os.getpid()}
+
+@app.get("/admin/profile")
+async def get_profile(current_user: dict = Depends(require_service_token)):
+    """Profiler status on this worker, or its last profile as folded stacks once finished"""
+    if profiler.active:
+        return {"status": "profiling", "remaining": profiler.remaining, "worker": os.getpid()}
+    if profiler.last_path is None or not os.path.exists(profiler.last_path):
+        raise HTTPException(status_code=404, detail="No profile captured")
+    with open(profiler.last_path, "rb") as f:
+        return Response(content=f.read(), media_type="text/plain; charset=utf-8")
 
 # Token generation endpoint for testing (only in development)
 @app.post("/auth/token")
 async def get_token(username: str = "test_user"):
     """Generate JWT token for testing purposes"""
-    if os.getenv("ENVIRONMENT") != "development":
+    if ENVIRONMENT != "development":
         raise HTTPException(status_code=404, detail="Not found")
     
     # No expiration for development
     access_token = create_access_token(data={"sub": username})
     return {"access_token": access_token, "token_type": "bearer", "expires": "never"}
 
+async def _download_snapshot_cli(path: str):
+    try:
+        index = await checker.download_region_snapshot()
+    finally:
+        await checker.shutdown()
+    export_regions(index, path)
+    logger.info(f"Region snapshot written: {len(index)} entries to {path}")
+
+async def _check_file_cli(path: str, window: int = STREAM_WINDOW):
+    async def read_lines():
+        with open(path, "rb") as f:
+            for line in f:
+                yield line
+    
+    try:
+        results = checker.check_plate_stream(iter_plate_lines(read_lines()), window)
+        async for line in ndjson_results(results):
+            sys.stdout.buffer.write(line)
+    finally:
+        await checker.shutdown()
+    sys.stdout.flush()
+
 if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == "check-file":
+        # python app.py check-file plates.txt > results.ndjson - stream a local plate file through the checker
+        asyncio.run(_check_file_cli(sys.argv[2]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "snapshot":
+        # python app.py snapshot [path] - dump every region from the configured source into a local
+        # snapshot (.jsonl), SQLite database (.db) or memory-mapped table (.tbl)
+        snapshot_path = sys.argv[2] if len(sys.argv) > 2 else (REGION_SNAPSHOT_PATH or "regions.jsonl")
+        asyncio.run(_download_snapshot_cli(snapshot_path))
+        sys.exit(0)
+    
     import uvicorn
     port = int(os.environ.get('PORT', 8080))  # Changed default port to 8080
     logger.info(f"Starting FastAPI app on port {port}")
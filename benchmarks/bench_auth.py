@@ -0,0 +1,65 @@
+"""
+Cost of the verify_token dependency alone, per call.
+
+Compares the old path (jwt.decode on every call) with the verified-token
+cache for a JWT caller, and times the static ZEABUR_BEARER_TOKEN path and a
+rejected token for reference.
+
+    python benchmarks/bench_auth.py --calls 50000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import jwt
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import app as app_module
+
+
+def legacy_verify(credentials: HTTPAuthorizationCredentials):
+    """verify_token as it was before the cache: decode on every call"""
+    if credentials.credentials == app_module.ZEABUR_BEARER_TOKEN:
+        return {"username": "zeabur_user"}
+    payload = jwt.decode(credentials.credentials, app_module.SECRET_KEY, algorithms=[app_module.ALGORITHM])
+    return {"username": payload["sub"]}
+
+
+async def time_calls(verify, credentials, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        try:
+            result = verify(credentials)
+            if asyncio.iscoroutine(result):
+                await result
+        except HTTPException:
+            pass
+    return time.perf_counter() - start
+
+
+def main(args):
+    jwt_token = app_module.create_access_token(data={"sub": "gate-01"})
+    cases = [
+        ("jwt, decode every call", legacy_verify, jwt_token),
+        ("jwt, cached", app_module.verify_token, jwt_token),
+        ("static token", app_module.verify_token, app_module.ZEABUR_BEARER_TOKEN),
+        ("invalid token", app_module.verify_token, "not-a-token"),
+    ]
+    for name, verify, token in cases:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        asyncio.run(time_calls(verify, credentials, 1000))  # warm up
+        elapsed = asyncio.run(time_calls(verify, credentials, args.calls))
+        print(f"{name:<24} {elapsed / args.calls * 1e6:>8.2f} us/call", file=sys.stderr)
+    print(f"token cache: {app_module.token_cache.hits} hits, {app_module.token_cache.misses} misses",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50000)
+    main(parser.parse_args())
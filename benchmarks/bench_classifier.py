@@ -0,0 +1,171 @@
+"""
+Per-plate CPU cost of plate classification: the original chain of
+is_old_military_format -> is_standard_plate -> parse_standard_plate ->
+analyze_non_standard_plate (regex string literals, repeated normalization)
+against the single-pass IndonesianPlateChecker.classify.
+
+Also times the table lookups that follow classification (vehicle type for
+standard plates, institution for old military plates): the original if/elif
+range chain and per-instance suffix sets against the module-level bisect
+table and int-indexed suffix array, and the cost of constructing a checker.
+
+    python benchmarks/bench_classifier.py --rounds 20
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app as app_module
+from app import IndonesianPlateChecker
+
+# Mixed corpus: standard, institution, old military (numeric / Roman), RI/CD, invalid
+CORPUS = [
+    "B1234ABC", "B-1234-ABC", "D 5678 XYZ", "AB1ZZ", "F9999KLM", "L2345XY",
+    "B1234ZZP", "A-9876-ZZT", "DK4321ZZH",
+    "12345-00", "1234-05", "50072-85", "9876-V", "1234-IX", "12345 - II",
+    "RI1", "RI-2", "CD12", "CC-1234", "CN 99",
+    "XX", "1234", "B-ABC", "12345-AA",
+]
+
+
+def legacy_classify(checker, plate_number):
+    """The original per-plate decision path, reproduced for comparison"""
+    plate_clean = plate_number.replace('-', '').replace(' ', '').upper()
+
+    plate_spaced = plate_number.replace(' ', '').upper()
+    numeric_match = re.match(r'^(\d{4,5})-(\d{2})$', plate_spaced)
+    if numeric_match and numeric_match.group(2) in checker.VALID_NUMERIC_SUFFIXES:
+        plate_spaced = plate_number.replace(' ', '').upper()
+        number_part, suffix_part = plate_spaced.split('-', 1)
+        re.match(r'^\d{4,5}$', number_part)
+        return "old_military"
+    roman_match = re.match(r'^(\d{4,5})-(I|II|III|IV|V|VI|VII|VIII|IX)$', plate_spaced)
+    if roman_match and roman_match.group(2) in checker.VALID_ROMAN_SUFFIXES:
+        plate_spaced = plate_number.replace(' ', '').upper()
+        number_part, suffix_part = plate_spaced.split('-', 1)
+        re.match(r'^\d{4,5}$', number_part)
+        return "old_military"
+
+    if re.match(r'^[A-Z]+\d+[A-Z]+$', plate_clean):
+        match = re.match(r'^([A-Z]+)(\d+)([A-Z]+)$', plate_clean)
+        match.group(1), int(match.group(2)), match.group(3)
+        return "standard"
+
+    plate_upper = plate_number.upper().replace('-', '').replace(' ', '')
+    if re.match(r'^RI\d*$', plate_upper):
+        return "state"
+    if re.match(r'^(CC|CD|CN|CS)\d*$', plate_upper):
+        return "diplomatic"
+    return "invalid"
+
+
+class LegacyTables:
+    """The per-instance tables and if/elif vehicle-type chain from the original __init__"""
+
+    def __init__(self):
+        self.VALID_NUMERIC_SUFFIXES = {f"{n:02d}" for n in range(100)}
+        self.VALID_ROMAN_SUFFIXES = {'I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX'}
+        self.military_suffix_mapping = {}
+        for suffix in self.VALID_NUMERIC_SUFFIXES:
+            if suffix == '00':
+                self.military_suffix_mapping[suffix] = 'ZZT'
+            elif suffix in ['01', '02', '03', '04', '05']:
+                self.military_suffix_mapping[suffix] = 'ZZD'
+            elif suffix in ['06', '07', '08']:
+                self.military_suffix_mapping[suffix] = 'ZZL'
+            elif suffix in ['09', '10', '11']:
+                self.military_suffix_mapping[suffix] = 'ZZU'
+            elif suffix in ['12', '13', '14', '15']:
+                self.military_suffix_mapping[suffix] = 'ZZP'
+            else:
+                self.military_suffix_mapping[suffix] = 'ZZD'
+        for roman in self.VALID_ROMAN_SUFFIXES:
+            self.military_suffix_mapping[roman] = 'ZZD'
+
+    def get_vehicle_type(self, middle_number):
+        if 1 <= middle_number <= 1999:
+            return "Mobil Penumpang"
+        elif 2000 <= middle_number <= 6999:
+            return "Sepeda Motor"
+        elif 7000 <= middle_number <= 7999:
+            return "Mobil Bus"
+        elif 8000 <= middle_number <= 8999:
+            return "Mobil Barang"
+        elif 9000 <= middle_number <= 9999:
+            return "Kendaraan Khusus"
+        else:
+            return "Tidak Diketahui"
+
+    def lookup(self, parsed):
+        if parsed.kind == "standard":
+            return self.get_vehicle_type(parsed.middle)
+        if parsed.kind == "old_military":
+            suffix = parsed.military_suffix
+            if suffix not in self.VALID_NUMERIC_SUFFIXES and suffix not in self.VALID_ROMAN_SUFFIXES:
+                return None
+            return self.military_suffix_mapping.get(suffix)
+        return None
+
+
+class SharedTables:
+    """The same lookups through the checker and the module-level tables"""
+
+    def __init__(self, checker):
+        self.checker = checker
+
+    def lookup(self, parsed):
+        if parsed.kind == "standard":
+            return self.checker.get_vehicle_type(parsed.middle)
+        if parsed.kind == "old_military":
+            return app_module.MILITARY_SUFFIX_MAPPING.get(parsed.military_suffix)
+        return None
+
+
+def measure(fn, plates, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for plate in plates:
+            fn(plate)
+        best = min(best, time.perf_counter() - start)
+    return best / len(plates) * 1e9
+
+
+def main(args):
+    logging.disable(logging.INFO)
+    checker = IndonesianPlateChecker()
+    plates = CORPUS * args.repeat
+
+    for plate in CORPUS:
+        assert legacy_classify(checker, plate) == checker.classify(plate).kind, plate
+
+    before = measure(lambda plate: legacy_classify(checker, plate), plates, args.rounds)
+    after = measure(checker.classify, plates, args.rounds)
+    print(f"corpus: {len(CORPUS)} plates x {args.repeat}, best of {args.rounds} rounds")
+    print(f"legacy chain       {before:>8.0f} ns/plate")
+    print(f"single-pass        {after:>8.0f} ns/plate  ({before / after:.2f}x)")
+
+    parsed = [checker.classify(plate) for plate in plates]
+    legacy, shared = LegacyTables(), SharedTables(checker)
+    for item in parsed[:len(CORPUS)]:
+        assert legacy.lookup(item) == shared.lookup(item), item
+    before = measure(legacy.lookup, parsed, args.rounds)
+    after = measure(shared.lookup, parsed, args.rounds)
+    print(f"lookups, if/elif   {before:>8.0f} ns/plate")
+    print(f"lookups, tables    {after:>8.0f} ns/plate  ({before / after:.2f}x)")
+
+    before = measure(lambda _: LegacyTables(), range(100), args.rounds)
+    after = measure(lambda _: IndonesianPlateChecker(), range(100), args.rounds)
+    print(f"legacy tables per checker  {before / 1000:>8.1f} us")
+    print(f"checker construction       {after / 1000:>8.1f} us (tables shared)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""
+Compare a fresh httpx.AsyncClient per lookup against the shared pooled client.
+
+    python benchmarks/bench_client_pool.py --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+from app import create_upstream_client
+from firestore_stub import LETTERS, PREFIXES, FirestoreStub, StubServer
+
+
+def urls(base_url: str, count: int):
+    for i in range(count):
+        yield f"{base_url}/nopol/{PREFIXES[i % len(PREFIXES)]}/belakang/{LETTERS[i % len(LETTERS)]}"
+
+
+async def run(fetch, base_url: str, count: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        async with semaphore:
+            response = await fetch(url)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls(base_url, count)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    with StubServer(FirestoreStub(latency=args.latency), port=args.port) as server:
+        async def per_request(url):
+            async with httpx.AsyncClient(timeout=20.0) as client:
+                return await client.get(url)
+
+        pooled_client = create_upstream_client()
+
+        async def pooled(url):
+            return await pooled_client.get(url)
+
+        try:
+            for name, fetch in (("per-request client", per_request), ("pooled client", pooled)):
+                elapsed = await run(fetch, server.base_url, args.requests, args.concurrency)
+                print(f"{name:<20} {args.requests / elapsed:>10.1f} req/s  "
+                      f"{elapsed / args.requests * 1000:>8.3f} ms/req")
+        finally:
+            await pooled_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+"""
+Per-plate cost of a gate feed: one GET /check-plate per read vs the /ws/gate WebSocket.
+
+Both run in-process through Starlette's TestClient against cache-hit plates with the
+rate limiter off, so the difference is the per-request auth, middleware and routing
+that the WebSocket pays once per connection instead of once per plate.
+
+    python benchmarks/bench_gate.py --plates 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+PLATES = ["B1234ABC", "D5678XYZ", "12345-00", "1234-V"]
+
+
+def http_feed(client, headers, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        response = client.get("/check-plate", params={"plate": PLATES[i % len(PLATES)]}, headers=headers)
+        assert response.status_code == 200, response.text
+    return time.perf_counter() - start
+
+
+def websocket_feed(client, headers, count: int) -> float:
+    with client.websocket_connect("/ws/gate", headers=headers) as websocket:
+        start = time.perf_counter()
+        for i in range(count):
+            websocket.send_text(json.dumps({"id": i, "plate": PLATES[i % len(PLATES)]}))
+        ids = {json.loads(websocket.receive_text())["id"] for _ in range(count)}
+        elapsed = time.perf_counter() - start
+    assert ids == set(range(count))
+    return elapsed
+
+
+def main(args):
+    app_module.limiter.enabled = False
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta", "samsat_office": "Samsat", "address": "-"}}
+    for key in (("B", "C"), ("D", "Z")):
+        app_module.checker.region_cache.set(key, region)
+
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    with TestClient(app_module.app) as client:
+        for name, feed in (("http per plate", http_feed), ("websocket", websocket_feed)):
+            feed(client, headers, 200)  # warm up
+            elapsed = feed(client, headers, args.plates)
+            print(f"{name:<16} {args.plates / elapsed:>9.1f} plates/s  {elapsed / args.plates * 1e6:>8.1f} us/plate",
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plates", type=int, default=5000)
+    main(parser.parse_args())
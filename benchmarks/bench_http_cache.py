@@ -0,0 +1,62 @@
+"""
+GET /check-plate with and without a current ETag: full responses vs 304 revalidations.
+
+Requests are driven in-process over ASGI against cache-hit plates with the rate
+limiter off, the way nginx revalidates an expired micro-cache entry. The app
+still resolves the plate to compute the ETag, so a 304 saves the body, not the
+work; a fresh nginx cache hit never reaches the app at all.
+
+    python benchmarks/bench_http_cache.py --requests 3000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+
+PLATES = ["B1234ABC", "D5678XYZ", "12345-00", "1234-V"]
+
+
+async def run(count: int, conditional: bool):
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        etags = {}
+        for plate in PLATES:
+            response = await client.get("/check-plate", params={"plate": plate})
+            etags[plate] = response.headers["etag"]
+        sent = 0
+        start = time.perf_counter()
+        for i in range(count):
+            plate = PLATES[i % len(PLATES)]
+            extra = {"If-None-Match": etags[plate]} if conditional else {}
+            response = await client.get("/check-plate", params={"plate": plate}, headers=extra)
+            assert response.status_code == (304 if conditional else 200), response.text
+            sent += len(response.content)
+        return time.perf_counter() - start, sent
+
+
+def main(args):
+    app_module.limiter.enabled = False
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta", "samsat_office": "Samsat", "address": "-"}}
+    for key in (("B", "C"), ("D", "Z")):
+        app_module.checker.region_cache.set(key, region)
+
+    for name, conditional in (("200 full", False), ("304 etag", True)):
+        asyncio.run(run(200, conditional))  # warm up
+        elapsed, sent = asyncio.run(run(args.requests, conditional))
+        print(f"{name:<10} {args.requests / elapsed:>9.1f} req/s  {elapsed / args.requests * 1e6:>8.1f} us/req  "
+              f"{sent / args.requests:>6.1f} body bytes/req", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    main(parser.parse_args())
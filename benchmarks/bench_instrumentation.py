@@ -0,0 +1,86 @@
+"""
+/check-plate overhead of the request instrumentation: off, Server-Timing plus slow-request
+stage timings, and the sampling profiler armed.
+
+Requests are driven in-process over ASGI against cache-hit plates with the rate limiter
+off and access logging silenced, so the differences are the instrumentation itself.
+
+    python benchmarks/bench_instrumentation.py --requests 3000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+
+PLATES = ["B1234ABC", "D5678XYZ", "12345-00", "1234-V"]
+
+
+async def run(count: int, expect_timing: bool):
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(count):
+            t0 = time.perf_counter()
+            response = await client.get("/check-plate", params={"plate": PLATES[i % len(PLATES)]}, headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            assert response.status_code == 200, response.text
+            assert ("server-timing" in response.headers) == expect_timing
+        return time.perf_counter() - start, latencies
+
+
+def configure(timing: bool, slow_ms: float):
+    app_module.app.user_middleware = [
+        middleware if middleware.cls is not app_module.RequestGuardMiddleware
+        else type(middleware)(app_module.RequestGuardMiddleware, timing=timing, slow_ms=slow_ms)
+        for middleware in app_module.app.user_middleware
+    ]
+    app_module.app.middleware_stack = None  # rebuilt on the next request
+
+
+async def profiled(count: int):
+    app_module.profiler.directory = tempfile.gettempdir()
+    app_module.profiler.start(count)
+    try:
+        return await run(count, expect_timing=False)
+    finally:
+        app_module.profiler.stop()
+
+
+def main(args):
+    app_module.limiter.enabled = False
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta", "samsat_office": "Samsat", "address": "-"}}
+    for key in (("B", "C"), ("D", "Z")):
+        app_module.checker.region_cache.set(key, region)
+
+    # slow_ms is set above every request so the slow-request log measures its bookkeeping, not its output
+    cases = [
+        ("off", False, 0.0, lambda: run(args.requests, expect_timing=False)),
+        ("timings", True, 60_000.0, lambda: run(args.requests, expect_timing=True)),
+        ("profiler", False, 0.0, lambda: profiled(args.requests)),
+    ]
+    for name, timing, slow_ms, measure in cases:
+        configure(timing, slow_ms)
+        asyncio.run(run(200, expect_timing=timing))  # warm up
+        elapsed, latencies = asyncio.run(measure())
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:<10} {args.requests / elapsed:>9.1f} req/s  "
+              f"p50 {statistics.median(latencies) * 1e6:>7.1f} us  p99 {p99 * 1e6:>7.1f} us", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+Per-response encode cost by response type.
+
+"fastapi default" is what returning a dict from a route costs: jsonable_encoder
+followed by JSONResponse.render (stdlib json). It is compared with json_bytes
+on the stdlib encoder and on orjson (when installed), and for the home payload
+with the bytes precomputed at import.
+
+    python benchmarks/bench_json.py --rounds 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import app as app_module
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlib_bytes(content):
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fastapi_default(content):
+    return JSONResponse(content=None).render(jsonable_encoder(content))
+
+
+def sample_payloads():
+    checker = app_module.checker
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta Pusat", "samsat_office": "Samsat Jakarta Pusat",
+                               "address": "Jl. Gunung Sahari Raya No. 1"}}
+    checker.region_cache.set(("B", "C"), region)
+    standard = asyncio.run(checker.check_plate("B1234ABC"))
+    military = asyncio.run(checker.check_plate("12345-00"))
+    batch = {"count": 100, "results": [app_module.batch_item(p, r)
+                                       for p, r in [("B1234ABC", standard), ("12345-00", military)] * 50]}
+    return [
+        ("standard", standard),
+        ("old military", military),
+        ("batch x100", batch),
+        ("home", json.loads(app_module.HOME_PAYLOAD)),
+    ]
+
+
+def time_encoder(encode, content, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(content)
+    return (time.perf_counter() - start) / rounds
+
+
+def main(args):
+    encoders = [("fastapi default", fastapi_default), ("json_bytes/json", stdlib_bytes)]
+    if orjson is not None:
+        encoders.append(("json_bytes/orjson", orjson.dumps))
+    for name, content in sample_payloads():
+        # Same document whichever encoder produced it
+        assert all(json.loads(encode(content)) == json.loads(fastapi_default(content)) for _, encode in encoders)
+        rounds = max(1, args.rounds // 50) if name.startswith("batch") else args.rounds
+        cells = [f"{label} {time_encoder(encode, content, rounds) * 1e6:>7.2f} us" for label, encode in encoders]
+        if name == "home":
+            cells.append(f"precomputed {time_encoder(lambda _: app_module.HOME_PAYLOAD, content, rounds) * 1e6:>5.2f} us")
+        print(f"{name:<14} " + "  ".join(cells), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,287 @@
+"""
+Load generator for /check-plate: p50/p95/p99 latency and requests/sec per plate kind.
+
+Starts the local Firestore stub and the app (uvicorn, or the gunicorn
+profile), then drives GET and POST /check-plate from a fixed number of
+closed-loop clients with a realistic plate mix: standard civil plates,
+ZZ* institution plates, old military plates (12345-00 / 1234-V) and RI/CD
+special plates. The plate sequence is generated from --seed, so two runs
+with the same arguments send the same requests in the same order.
+
+Save a run with --output and compare a later commit against it with
+--baseline; the exit status is 1 when RPS drops or p99 grows by more than
+--tolerance. Point --target at an already running server to skip the stub
+and the local app.
+
+    python benchmarks/bench_load.py --duration 20 --output before.json
+    python benchmarks/bench_load.py --duration 20 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from firestore_stub import PREFIXES, FirestoreStub, StubServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TOKEN = "bench-token"
+INSTITUTIONS = "TUDLPH"
+ROMAN = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX"]
+DEFAULT_MIX = "standard=70,institution=10,military=10,special=10"
+
+
+def standard_plate(rng: random.Random) -> str:
+    letters = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXY") for _ in range(rng.randint(1, 3)))
+    return f"{rng.choice(PREFIXES)}{rng.randint(1, 9999)}{letters}"
+
+
+def institution_plate(rng: random.Random) -> str:
+    return f"{rng.choice(PREFIXES)}{rng.randint(1, 9999)}ZZ{rng.choice(INSTITUTIONS)}"
+
+
+def military_plate(rng: random.Random) -> str:
+    digits = rng.randint(1000, 99999)
+    suffix = f"{rng.randint(0, 99):02d}" if rng.random() < 0.7 else rng.choice(ROMAN)
+    return f"{digits}-{suffix}"
+
+
+def special_plate(rng: random.Random) -> str:
+    return f"{rng.choice(['RI', 'CD', 'CC', 'CN', 'CS'])}{rng.randint(1, 9999)}"
+
+
+GENERATORS = {
+    "standard": standard_plate,
+    "institution": institution_plate,
+    "military": military_plate,
+    "special": special_plate,
+}
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in GENERATORS:
+            raise argparse.ArgumentTypeError(f"unknown plate kind {kind!r}, expected one of {', '.join(GENERATORS)}")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def build_workload(mix: dict, size: int, post_ratio: float, seed: int):
+    """A fixed sequence of (kind, method, plate) requests"""
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    workload = []
+    for _ in range(size):
+        kind = rng.choices(kinds, weights)[0]
+        method = "POST" if rng.random() < post_ratio else "GET"
+        workload.append((kind, method, GENERATORS[kind](rng)))
+    return workload
+
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+async def drive(base_url: str, token: str, workload, duration: float, concurrency: int):
+    """Closed-loop clients walking the workload; returns per-kind latencies, errors and elapsed time"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = {kind: [] for kind in GENERATORS if any(item[0] == kind for item in workload)}
+    errors = dict.fromkeys(latencies, 0)
+    position = 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=30.0) as client:
+        async def worker():
+            nonlocal position
+            while time.perf_counter() < deadline:
+                kind, method, plate = workload[position % len(workload)]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    if method == "POST":
+                        response = await client.post("/check-plate", json={"plate": plate})
+                    else:
+                        response = await client.get("/check-plate", params={"plate": plate})
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                if failed:
+                    errors[kind] += 1
+                else:
+                    latencies[kind].append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - started
+
+
+def start_server(args, stub_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        FIRESTORE_BASE_URL=stub_url,
+        ZEABUR_BEARER_TOKEN=TOKEN,
+        RATE_LIMIT_ENABLED="false",
+        LOG_LEVEL="WARNING",
+        PROMETHEUS_MULTIPROC_DIR="",
+    )
+    if args.server == "gunicorn":
+        env.update(PORT=str(args.port), WEB_CONCURRENCY=str(args.workers))
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null",
+                   "app:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning",
+                   "--no-access-log"]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def git_commit() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return result.stdout.strip() + ("-dirty" if dirty else "")
+    except OSError:
+        return "unknown"
+
+
+def run(args, base_url: str, token: str) -> dict:
+    workload = build_workload(args.mix, args.workload_size, args.post_ratio, args.seed)
+    asyncio.run(wait_ready(f"{base_url}/health"))
+    if args.warmup:
+        asyncio.run(drive(base_url, token, workload, args.warmup, args.concurrency))
+    latencies, errors, elapsed = asyncio.run(drive(base_url, token, workload, args.duration, args.concurrency))
+
+    results = {kind: summarize(latencies[kind], errors[kind], elapsed) for kind in latencies}
+    results["total"] = summarize([value for values in latencies.values() for value in values],
+                                 sum(errors.values()), elapsed)
+    return results
+
+
+def report(results: dict, baseline: dict = None):
+    print(f"{'kind':<12} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+          file=sys.stderr)
+    for kind, row in results.items():
+        line = (f"{kind:<12} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f} "
+                f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+        if baseline and kind in baseline:
+            before = baseline[kind]
+            line += (f"   req/s {relative_change(before['rps'], row['rps']):>+6.1%}"
+                     f"  p99 {relative_change(before['p99_ms'], row['p99_ms']):>+6.1%}")
+        print(line, file=sys.stderr)
+
+
+def relative_change(before: float, after: float) -> float:
+    return (after - before) / before if before else 0.0
+
+
+def regressions(results: dict, baseline: dict, tolerance: float):
+    total, before = results["total"], baseline["total"]
+    found = []
+    if relative_change(before["rps"], total["rps"]) < -tolerance:
+        found.append(f"req/s {before['rps']:.1f} -> {total['rps']:.1f}")
+    if relative_change(before["p99_ms"], total["p99_ms"]) > tolerance:
+        found.append(f"p99 {before['p99_ms']:.2f} ms -> {total['p99_ms']:.2f} ms")
+    return found
+
+
+def main(args):
+    settings = {
+        "duration": args.duration, "concurrency": args.concurrency, "mix": args.mix, "post_ratio": args.post_ratio,
+        "seed": args.seed, "workload_size": args.workload_size, "latency": args.latency,
+        "server": "external" if args.target else f"{args.server} x{args.workers}",
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changed = {k: (v, baseline["settings"].get(k)) for k, v in settings.items() if baseline["settings"].get(k) != v}
+        if changed:
+            print(f"warning: settings differ from the baseline: {changed}", file=sys.stderr)
+
+    if args.target:
+        results = run(args, args.target.rstrip("/"), args.token or TOKEN)
+    else:
+        with StubServer(FirestoreStub(latency=args.latency), port=args.stub_port) as stub:
+            server = start_server(args, stub.base_url)
+            try:
+                results = run(args, f"http://127.0.0.1:{args.port}", TOKEN)
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f"commit {git_commit()}, {settings['server']}, concurrency {args.concurrency}, "
+          f"{args.duration:.0f}s, stub latency {args.latency * 1000:.0f} ms", file=sys.stderr)
+    report(results, baseline["results"] if baseline else None)
+
+    if args.output:
+        document = {"commit": git_commit(), "python": platform.python_version(), "cpus": os.cpu_count(),
+                    "settings": settings, "results": results}
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if baseline:
+        found = regressions(results, baseline["results"], args.tolerance)
+        if found:
+            sys.exit(f"regression against {baseline['commit']} beyond {args.tolerance:.0%}: {'; '.join(found)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Plate kind weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--post-ratio", type=float, default=0.5, help="Share of requests sent as POST")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workload-size", type=int, default=10000, help="Distinct requests before the mix repeats")
+    parser.add_argument("--latency", type=float, default=0.005, help="Stub latency per upstream request in seconds")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="Gunicorn worker processes")
+    parser.add_argument("--port", type=int, default=8182)
+    parser.add_argument("--stub-port", type=int, default=8766)
+    parser.add_argument("--target", help="Base URL of a running server; skips the stub and the local app")
+    parser.add_argument("--token", help="Bearer token for --target")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression (default 0.10)")
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+"""
+Request throughput of /check-plate under different logging configurations.
+
+Requests are driven in-process over ASGI (no sockets) against old military
+plates and cache-hit standard plates, so the numbers isolate CPU spent in the
+app and its logging. Log output goes to os.devnull. "old per-step" is the
+baseline: the original eager f-string INFO line for each lookup step,
+reproduced around check_plate, on top of the access record. Each
+configuration reports its best of --rounds interleaved runs.
+
+    python benchmarks/bench_logging.py --requests 3000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+
+PLATES = ["B1234ABC", "D5678XYZ", "12345-00", "1234-V", "B1234ZZP", "50072-85"]
+
+CONFIGS = [
+    ("old per-step", "INFO", "text", True),
+    ("debug, text", "DEBUG", "text", False),
+    ("info, text", "INFO", "text", False),
+    ("info, json", "INFO", "json", False),
+    ("warning (off)", "WARNING", "text", False),
+]
+
+
+def legacy_check_plate(checker):
+    """check_plate with the original per-step INFO lines, formatted whether or not they are emitted"""
+    logger = app_module.logger
+    check_plate = checker.check_plate
+
+    async def logged(plate_number):
+        logger.info(f"=== CHECKING PLATE: {plate_number} ===")
+        parsed = checker.classify(plate_number)
+        result = await check_plate(plate_number)
+        if parsed.kind == app_module.PLATE_OLD_MILITARY:
+            logger.info(f"PROCESSING OLD MILITARY PLATE: {parsed.clean}")
+            logger.info(f"OLD MILITARY RESULT: {result}")
+            return result
+        logger.info(f"PARSED: prefix={parsed.prefix}, middle={parsed.middle}, suffix={parsed.suffix}")
+        institution_name = checker.get_institution_name(parsed.suffix)
+        logger.info(f"get_institution_name('{parsed.suffix}') = '{institution_name}'")
+        logger.info(f"INSTITUTION CHECK: suffix='{parsed.suffix}' -> institution='{institution_name}'")
+        if institution_name:
+            logger.info(f"ADDED INSTITUTION FIELD: {institution_name}")
+        else:
+            logger.info("NO INSTITUTION FOUND")
+        logger.info(f"FINAL RESULT KEYS: {list(result.keys())}")
+        return result
+
+    return logged
+
+
+async def run(count: int) -> float:
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(count):
+            response = await client.get("/check-plate", params={"plate": PLATES[i % len(PLATES)]}, headers=headers)
+            assert response.status_code == 200, response.text
+        return time.perf_counter() - start
+
+
+def main(args):
+    app_module.limiter.enabled = False
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta", "samsat_office": "Samsat", "address": "-"}}
+    for key in (("B", "C"), ("D", "Z"), ("B", "P")):
+        app_module.checker.region_cache.set(key, region)
+
+    checker = app_module.checker
+    best = {name: float("inf") for name, *_ in CONFIGS}
+    with open(os.devnull, "w") as devnull:
+        # Rounds cycle through the configurations so drift in machine speed hits them all alike
+        for _ in range(args.rounds):
+            for name, level, fmt, legacy in CONFIGS:
+                app_module.configure_logging(level=level, fmt=fmt, module_levels="httpx=WARNING", stream=devnull)
+                if legacy:
+                    checker.check_plate = legacy_check_plate(checker)
+                try:
+                    asyncio.run(run(200))  # warm up
+                    best[name] = min(best[name], asyncio.run(run(args.requests)))
+                finally:
+                    checker.__dict__.pop("check_plate", None)
+    for name, elapsed in best.items():
+        print(f"{name:<16} {args.requests / elapsed:>9.1f} req/s  {elapsed / args.requests * 1e6:>8.1f} us/req")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=5)
+    main(parser.parse_args())
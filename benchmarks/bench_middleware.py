@@ -0,0 +1,99 @@
+"""
+/check-plate latency and throughput: old stacked middlewares vs RequestGuardMiddleware.
+
+The "stacked" configuration rebuilds the previous chain: SlowAPIMiddleware,
+TrustedHostMiddleware, CORSMiddleware and the two @app.middleware("http")
+wrappers for security headers and the request timeout. Requests are driven
+in-process over ASGI against cache-hit plates with the rate limiter off and
+access logging silenced, so the numbers isolate middleware overhead.
+
+    python benchmarks/bench_middleware.py --requests 3000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from slowapi.middleware import SlowAPIMiddleware
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import app as app_module
+
+PLATES = ["B1234ABC", "D5678XYZ", "12345-00", "1234-V"]
+
+
+async def add_security_headers(request, call_next):
+    response = await call_next(request)
+    for name, value in app_module.SECURITY_HEADERS + app_module.NO_STORE_HEADERS:
+        response.headers[name.decode()] = value.decode()
+    return response
+
+
+async def timeout_middleware(request, call_next):
+    start = time.perf_counter()
+    response = await asyncio.wait_for(call_next(request), timeout=30.0)
+    route = request.scope.get("route")
+    route_label = route.path if route is not None else "unmatched"
+    app_module.REQUESTS_TOTAL.labels(route_label, app_module.request_outcome(response.status_code, None)).inc()
+    app_module.REQUEST_DURATION.labels(route_label).observe(time.perf_counter() - start)
+    return response
+
+
+def stacked_middleware():
+    """The middleware list as it was before RequestGuardMiddleware, outermost first"""
+    return [
+        Middleware(BaseHTTPMiddleware, dispatch=timeout_middleware),
+        Middleware(BaseHTTPMiddleware, dispatch=add_security_headers),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                   allow_methods=["GET", "POST"], allow_headers=["*"]),
+        Middleware(TrustedHostMiddleware, allowed_hosts=["*"]),
+        Middleware(SlowAPIMiddleware),
+    ]
+
+
+async def run(count: int):
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(count):
+            t0 = time.perf_counter()
+            response = await client.get("/check-plate", params={"plate": PLATES[i % len(PLATES)]}, headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            assert response.status_code == 200, response.text
+            assert response.headers["x-frame-options"] == "DENY"
+        return time.perf_counter() - start, latencies
+
+
+def main(args):
+    app_module.limiter.enabled = False
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta", "samsat_office": "Samsat", "address": "-"}}
+    for key in (("B", "C"), ("D", "Z")):
+        app_module.checker.region_cache.set(key, region)
+
+    current = list(app_module.app.user_middleware)
+    for name, middleware in (("stacked", stacked_middleware()), ("single ASGI", current)):
+        app_module.app.user_middleware = middleware
+        app_module.app.middleware_stack = None  # rebuilt on the next request
+        asyncio.run(run(200))  # warm up
+        elapsed, latencies = asyncio.run(run(args.requests))
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:<12} {args.requests / elapsed:>9.1f} req/s  "
+              f"p50 {statistics.median(latencies) * 1e6:>7.1f} us  p99 {p99 * 1e6:>7.1f} us", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    main(parser.parse_args())
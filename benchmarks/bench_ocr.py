@@ -0,0 +1,85 @@
+"""
+OCR misread correction: recovery rate and cost per plate for PlateIndex.correct.
+
+Generates valid standard and old military plates, injects one or two common
+OCR misreads (O/0, I/1, B/8, S/5, ...) into each, and checks that the best
+candidate is the original plate. The region index is the one the local
+Firestore stub serves, or a region snapshot given with --snapshot.
+
+    python benchmarks/bench_ocr.py --plates 20000
+    python benchmarks/bench_ocr.py --snapshot regions.jsonl
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app as app_module
+from firestore_stub import PREFIXES
+
+MISREADS = {"0": "O", "O": "0", "1": "I", "I": "1", "8": "B", "B": "8", "5": "S", "S": "5", "2": "Z", "Z": "2",
+            "D": "0", "G": "6", "6": "G"}
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def valid_plate(rng: random.Random, pairs) -> str:
+    if rng.random() < 0.1:
+        return f"{rng.randint(1000, 99999)}-{rng.randint(0, 99):02d}"
+    prefix, letter = rng.choice(pairs)
+    suffix = "".join(rng.choice(LETTERS) for _ in range(rng.randint(0, 2))) + letter
+    return f"{prefix}{rng.randint(1, 9999)}{suffix}"
+
+
+def misread(rng: random.Random, plate: str, count: int) -> str:
+    positions = [i for i, char in enumerate(plate) if char in MISREADS]
+    chars = list(plate)
+    for i in rng.sample(positions, min(count, len(positions))):
+        chars[i] = MISREADS[chars[i]]
+    return "".join(chars)
+
+
+def run(index, samples):
+    corrected = changed = 0
+    start = time.perf_counter()
+    for original, read in samples:
+        result = index.correct(read)
+        if result is not None:
+            changed += 1
+            corrected += result[0] == original
+    elapsed = time.perf_counter() - start
+    return corrected, changed, elapsed / len(samples)
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    if args.snapshot:
+        index = app_module.PlateIndex.from_regions(app_module.load_region_snapshot(args.snapshot))
+    else:
+        index = app_module.PlateIndex(pairs=[(prefix, letter) for prefix in PREFIXES for letter in LETTERS])
+    pairs = sorted(index.pairs)
+    name = f"{len(pairs)} region pairs"
+
+    for edits in (1, 2):
+        samples = []
+        while len(samples) < args.plates:
+            plate = valid_plate(rng, pairs)
+            read = misread(rng, plate, edits)
+            parsed = app_module.checker.classify(read)
+            # Only misreads the region index rejects reach the fuzzy pass
+            if read != plate and not index.accepts(parsed):
+                samples.append((plate, read))
+        corrected, changed, per_plate = run(index, samples)
+        print(f"{edits} misread(s)  {name:<18} recovered {corrected / len(samples):>6.1%}  "
+              f"wrong {(changed - corrected) / len(samples):>6.1%}  {per_plate * 1e6:>6.2f} us/plate",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plates", type=int, default=20000)
+    parser.add_argument("--snapshot", help="Region snapshot (JSON lines) to build the index from")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,125 @@
+"""
+Overload test for the adaptive upstream concurrency limit: p99 and shedding at a multiple of upstream saturation.
+
+Runs in-process: the app over ASGI transport, Firestore answered by the stub
+with a fixed capacity (--capacity requests at once, --latency each, the rest
+queue), so upstream saturation is capacity / latency lookups per second. The
+region cache is disabled, so every standard plate is a lookup. Arrivals are
+open-loop (Poisson) at --load times saturation, plus a stream of cheap old
+military and RI/CD plates that need no lookup at all.
+
+Each case reports served and shed (503) lookups and p50/p99 of the served
+ones, and p99 of the cheap plates. With the limit on, p99 at 2x saturation
+stays within a few upstream round trips and does not grow with the run; with
+it off, lookups queue behind the saturated upstream and p99 grows with
+the run length (in-process there are no socket timeouts to cut it short).
+
+    python benchmarks/bench_overload.py --duration 10 --load 2
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+from firestore_stub import DOCUMENTS_PATH, LETTERS, FirestoreStub
+
+CHEAP_PLATES = ["12345-00", "1234-V", "RI 1", "CD 12 34"]
+
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(p / 100 * len(sorted_values))) - 1]
+
+
+def install_upstream(args, limited: bool):
+    stub = FirestoreStub(latency=args.latency, capacity=args.capacity)
+    client = app_module.create_upstream_client(transport=httpx.ASGITransport(app=stub))
+    source = app_module.FirestoreRegionSource(base_url=f"http://stub{DOCUMENTS_PATH}", client=client)
+    if not limited:
+        source.limit = None
+    app_module.checker.source = source
+    app_module.checker.region_cache = app_module.RegionCache(ttl=0, negative_ttl=0, stale_ttl=0)
+    return source
+
+
+async def run(args, rate: float, seed: int):
+    """Open-loop arrivals for args.duration seconds; returns latencies and status counts per kind"""
+    rng = random.Random(seed)
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    results = {"lookup": ([], {}), "cheap": ([], {})}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers,
+                                 timeout=60.0) as client:
+        async def send(kind: str, plate: str):
+            start = time.perf_counter()
+            response = await client.get("/check-plate", params={"plate": plate})
+            latencies, statuses = results[kind]
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            elif response.status_code == 503:
+                assert response.headers["retry-after"] == str(app_module.UPSTREAM_RETRY_AFTER)
+
+        tasks = []
+        total_rate = rate + args.cheap_rate
+        started = time.perf_counter()
+        next_at = 0.0
+        while next_at < args.duration:
+            delay = started + next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if rng.random() < rate / total_rate:
+                # Two-letter prefixes give ~17k distinct keys, so concurrent lookups rarely coalesce
+                plate = f"{rng.choice(LETTERS)}{rng.choice(LETTERS)}{rng.randint(1, 9999)}{rng.choice(LETTERS)}"
+                tasks.append(asyncio.create_task(send("lookup", plate)))
+            else:
+                tasks.append(asyncio.create_task(send("cheap", rng.choice(CHEAP_PLATES))))
+            next_at += rng.expovariate(total_rate)
+        await asyncio.gather(*tasks)
+    return results
+
+
+def main(args):
+    app_module.limiter.enabled = False
+    app_module.configure_logging(level="CRITICAL", fmt="text", module_levels="", stream=sys.stderr)
+    saturation = args.capacity / args.latency
+    print(f"upstream saturation {saturation:.0f} lookups/s ({args.capacity} at once, {args.latency * 1000:.0f} ms), "
+          f"cheap plates {args.cheap_rate:.0f}/s", file=sys.stderr)
+
+    cases = [("limit on", True, 0.5), ("limit on", True, args.load), ("limit off", False, args.load)]
+    for name, limited, load in cases:
+        source = install_upstream(args, limited)
+        results = asyncio.run(run(args, saturation * load, args.seed))
+        asyncio.run(source.shutdown())
+        latencies, statuses = results["lookup"]
+        latencies.sort()
+        cheap = sorted(results["cheap"][0])
+        attempted = sum(statuses.values())
+        shed = statuses.get(503, 0)
+        limit = f"{source.limit.limit:>5.1f}" if limited else "    -"
+        print(f"{name:<10} {load:>4.1f}x  lookups {attempted:>6}  served {len(latencies) / attempted:>6.1%}  "
+              f"shed {shed / attempted:>6.1%}  other {(attempted - len(latencies) - shed) / attempted:>6.1%}  "
+              f"p50 {percentile(latencies, 50) * 1000:>7.1f} ms  p99 {percentile(latencies, 99) * 1000:>7.1f} ms  "
+              f"cheap p99 {percentile(cheap, 99) * 1000:>6.1f} ms  limit {limit}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of arrivals per case")
+    parser.add_argument("--load", type=float, default=2.0, help="Lookup arrival rate as a multiple of saturation")
+    parser.add_argument("--capacity", type=int, default=8, help="Stub requests served at once")
+    parser.add_argument("--latency", type=float, default=0.04, help="Stub seconds per request")
+    parser.add_argument("--cheap-rate", type=float, default=50.0, help="Cheap plates per second")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+"""
+Cost of the rate limiter: raw limits strategies and /check-plate throughput.
+
+The first table times a single hit() per strategy against the given storage
+(memory:// by default; pass --storage redis://localhost:6379/0 to measure the
+shared backend). The second drives /check-plate in-process over ASGI with the
+limiter off, with the old single fixed-window limit per IP, and with the
+current per-IP + per-token sliding-window-counter limits.
+
+    python benchmarks/bench_rate_limit.py --hits 50000 --requests 3000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Limits high enough that the benchmark never gets a 429
+os.environ.setdefault("RATE_LIMIT", "1000000/minute")
+os.environ.setdefault("TOKEN_RATE_LIMIT", "1000000/minute")
+
+import httpx
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import app as app_module
+
+PLATES = ["B1234ABC", "D5678XYZ", "12345-00", "1234-V"]
+
+
+def bench_strategies(storage_uri: str, hits: int):
+    storage = storage_from_string(storage_uri)
+    item = parse("1000000/minute")
+    for name, strategy_cls in STRATEGIES.items():
+        strategy = strategy_cls(storage)
+        keys = [f"bench-{name}-{i % 64}" for i in range(hits)]
+        start = time.perf_counter()
+        for key in keys:
+            strategy.hit(item, key)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24} {elapsed / hits * 1e6:>8.2f} us/hit", file=sys.stderr)
+    storage.reset()
+
+
+async def run(count: int) -> float:
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(count):
+            response = await client.get("/check-plate", params={"plate": PLATES[i % len(PLATES)]}, headers=headers)
+            assert response.status_code == 200, response.text
+        return time.perf_counter() - start
+
+
+def bench_requests(count: int):
+    region = {"plate_region": {"province": "DKI Jakarta", "city": "Jakarta", "samsat_office": "Samsat", "address": "-"}}
+    for key in (("B", "C"), ("D", "Z")):
+        app_module.checker.region_cache.set(key, region)
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+
+    limiter = app_module.limiter
+    current = limiter._limiter
+    route_limits = dict(limiter._route_limits)
+    legacy_limits = {name: [lim for lim in limits if lim.key_func is not app_module.get_token_key]
+                     for name, limits in route_limits.items()}
+    configs = [
+        ("limiter off", False, current, route_limits),
+        ("fixed-window, IP", True, STRATEGIES["fixed-window"](limiter._storage), legacy_limits),
+        ("sliding, IP + token", True, current, route_limits),
+    ]
+    for name, enabled, strategy, limits in configs:
+        limiter.enabled = enabled
+        limiter._limiter = strategy
+        limiter._route_limits = limits
+        limiter.reset()
+        asyncio.run(run(200))  # warm up
+        elapsed = asyncio.run(run(count))
+        print(f"{name:<24} {count / elapsed:>9.1f} req/s  {elapsed / count * 1e6:>8.1f} us/req", file=sys.stderr)
+
+
+def main(args):
+    bench_strategies(args.storage, args.hits)
+    bench_requests(args.requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--storage", default="memory://")
+    parser.add_argument("--hits", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=3000)
+    main(parser.parse_args())
@@ -0,0 +1,62 @@
+"""
+Per-lookup cost of each region source.
+
+Downloads the FirestoreStub table once, exports it as a SQLite database and a
+compact memory-mapped table, then times RegionSource.lookup for each source
+over the same keys (Firestore with the stub on localhost, no cache).
+
+    python benchmarks/bench_region_source.py --lookups 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app as app_module
+from firestore_stub import FirestoreStub, StubServer
+
+
+async def time_lookups(source, keys, count: int) -> float:
+    await source.startup()
+    try:
+        start = time.perf_counter()
+        for i in range(count):
+            result = await source.lookup(*keys[i % len(keys)])
+            assert result is not None and "plate_region" in result
+        return (time.perf_counter() - start) / count
+    finally:
+        await source.shutdown()
+
+
+def main(args):
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+    with StubServer(FirestoreStub(), port=args.port) as server, tempfile.TemporaryDirectory() as tmp:
+        firestore = app_module.FirestoreRegionSource(server.base_url)
+        index = asyncio.run(app_module.IndonesianPlateChecker(source=firestore).download_region_snapshot())
+        keys = sorted(index)
+        db_path, table_path = os.path.join(tmp, "regions.db"), os.path.join(tmp, "regions.tbl")
+        app_module.write_region_sqlite(index, db_path)
+        app_module.write_region_table(index, table_path)
+        print(f"{len(index)} regions: sqlite {os.path.getsize(db_path)} bytes, table {os.path.getsize(table_path)} bytes",
+              file=sys.stderr)
+
+        sources = [
+            ("firestore (stub)", app_module.FirestoreRegionSource(server.base_url), max(1, args.lookups // 50)),
+            ("sqlite", app_module.SQLiteRegionSource(db_path), args.lookups),
+            ("table (mmap)", app_module.RegionTableSource(table_path), args.lookups),
+        ]
+        for name, source, count in sources:
+            per_lookup = asyncio.run(time_lookups(source, keys, count))
+            print(f"{name:<18} {per_lookup * 1e6:>10.2f} us/lookup", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8767)
+    main(parser.parse_args())
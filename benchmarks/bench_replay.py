@@ -0,0 +1,282 @@
+"""
+Replay captured plate traffic through the app in-process, with Firestore answered from a cassette.
+
+Reads a JSON-lines traffic log, one query per line:
+
+    {"ts": 1760700000.25, "method": "GET", "plate": "B 1234 ABC", "status": 200, "result": {...}}
+
+Only `plate` is required. `ts` is epoch seconds or an ISO 8601 time as written
+by LOG_FORMAT=json. `status` and `result` are the expected response. Requests
+go through the whole middleware stack over ASGI transport, at the log's own
+pace scaled by --speed, or back to back from --concurrency clients when
+--speed is 0 or the log has no timestamps.
+
+Region lookups are answered from a cassette of recorded
+`nopol/{prefix}/belakang/{letter}` responses, so no network is needed. With
+--record, lookups missing from the cassette are fetched from Firestore
+(FIRESTORE_BASE_URL) or from the local stub and saved. The region cache starts
+cold and keeps wall-clock TTLs, so heavily accelerated replays of long logs
+see fewer expiries than production did.
+
+Reports throughput, latency percentiles, region cache hit ratios and responses
+that differ from the expected ones; the exit status is 1 when any differ.
+--write-results saves this run's responses as the expected results of the next.
+
+    python benchmarks/bench_replay.py traffic.jsonl --cassette regions.cassette.jsonl --record stub
+    python benchmarks/bench_replay.py traffic.jsonl --cassette regions.cassette.jsonl --write-results expected.jsonl
+    python benchmarks/bench_replay.py expected.jsonl --cassette regions.cassette.jsonl --speed 10
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+from firestore_stub import DOCUMENTS_PATH, FirestoreStub
+
+CACHE_EVENTS = ["index_hit", "hit", "stale_hit", "negative_hit", "miss"]
+NOT_FOUND = {"error": {"code": 404, "status": "NOT_FOUND"}}
+
+
+class Cassette(httpx.AsyncBaseTransport):
+    """Recorded Firestore responses keyed on the document path; misses go to `upstream` when recording"""
+
+    def __init__(self, path: str, upstream: httpx.AsyncBaseTransport = None, latency: float = 0.0):
+        self.path = path
+        self.upstream = upstream
+        self.latency = latency
+        self.responses = {}
+        self.served = 0
+        self.recorded = 0
+        self.missing = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self.responses[item["path"]] = (item["status"], item["body"])
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request.url.path.split("/documents/", 1)[-1]
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        entry = self.responses.get(key)
+        if entry is None and self.upstream is not None:
+            response = await self.upstream.handle_async_request(request)
+            body = await response.aread()
+            entry = (response.status_code, json.loads(body) if body else None)
+            # Transient upstream failures are passed on but not recorded
+            if response.status_code in (200, 404):
+                self.responses[key] = entry
+                self.recorded += 1
+        if entry is None:
+            self.missing.add(key)
+            entry = (404, NOT_FOUND)
+        self.served += 1
+        return httpx.Response(entry[0], json=entry[1], request=request)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            for key, (status, body) in sorted(self.responses.items()):
+                f.write(json.dumps({"path": key, "status": status, "body": body}, ensure_ascii=False) + "\n")
+
+
+def parse_ts(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def read_log(path: str):
+    """Plate queries from a JSON-lines log; lines without a plate are skipped"""
+    entries, skipped = [], 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if not isinstance(item, dict) or not item.get("plate"):
+                skipped += 1
+                continue
+            item["method"] = item.get("method", "GET").upper()
+            item["ts"] = parse_ts(item.get("ts"))
+            entries.append(item)
+    return entries, skipped
+
+
+def install_cassette(cassette: Cassette, record: str):
+    base_url = f"http://stub{DOCUMENTS_PATH}" if record == "stub" else app_module.FIRESTORE_BASE_URL
+    client = app_module.create_upstream_client(transport=cassette)
+    app_module.checker.source = app_module.FirestoreRegionSource(base_url=base_url, client=client)
+
+
+def cache_events() -> dict:
+    return {event: app_module.REGION_CACHE_EVENTS.labels(event=event)._value.get() for event in CACHE_EVENTS}
+
+
+async def replay(entries, speed: float, concurrency: int):
+    """Send every entry; returns (latency, status, result) per entry, elapsed time and the worst lag behind the log"""
+    transport = httpx.ASGITransport(app=app_module.app)
+    headers = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+    outcomes = [None] * len(entries)
+    lag = 0.0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", headers=headers) as client:
+        async def send(i: int):
+            entry = entries[i]
+            start = time.perf_counter()
+            if entry["method"] == "POST":
+                response = await client.post("/check-plate", json={"plate": entry["plate"]})
+            else:
+                response = await client.get("/check-plate", params={"plate": entry["plate"]})
+            latency = time.perf_counter() - start
+            outcomes[i] = (latency, response.status_code, response.json() if response.content else None)
+
+        started = time.perf_counter()
+        if speed > 0 and all(entry["ts"] is not None for entry in entries):
+            first = min(entry["ts"] for entry in entries)
+            tasks = []
+            for i, entry in enumerate(entries):
+                delay = started + (entry["ts"] - first) / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lag = max(lag, -delay)
+                tasks.append(asyncio.create_task(send(i)))
+            await asyncio.gather(*tasks)
+        else:
+            pending = iter(range(len(entries)))
+
+            async def worker():
+                for i in pending:
+                    await send(i)
+                    # Cache hits never block in-process, so yield or one client would starve the rest
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return outcomes, time.perf_counter() - started, lag
+
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(p / 100 * len(sorted_values))) - 1]
+
+
+def differences(expected: dict, status: int, result) -> list:
+    found = []
+    if "status" in expected and expected["status"] != status:
+        found.append(f"status {expected['status']} -> {status}")
+    if "result" in expected and expected["result"] != result:
+        before, after = expected["result"], result
+        if isinstance(before, dict) and isinstance(after, dict):
+            keys = sorted(key for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+            found.append(f"result fields {', '.join(keys)}")
+        else:
+            found.append("result")
+    return found
+
+
+def report(entries, outcomes, elapsed: float, lag: float, events: dict, cassette: Cassette, show_diffs: int) -> int:
+    latencies = sorted(outcome[0] for outcome in outcomes)
+    statuses = Counter(outcome[1] for outcome in outcomes)
+    print(f"{len(outcomes)} requests in {elapsed:.2f}s  {len(outcomes) / elapsed:.1f} req/s  "
+          f"max lag behind the log {lag * 1000:.1f} ms", file=sys.stderr)
+    print("latency ms  " + "  ".join(f"p{p} {percentile(latencies, p) * 1000:.2f}" for p in (50, 90, 99))
+          + f"  max {latencies[-1] * 1000:.2f}", file=sys.stderr)
+    print("status      " + "  ".join(f"{code}: {count}" for code, count in sorted(statuses.items())), file=sys.stderr)
+
+    lookups = sum(events.values())
+    if lookups:
+        hits = lookups - events["miss"]
+        print(f"region lookups {lookups:.0f}  hit ratio {hits / lookups:.1%}  "
+              + "  ".join(f"{event} {count:.0f}" for event, count in events.items()), file=sys.stderr)
+    print(f"cassette    {cassette.served} upstream requests served, {cassette.recorded} recorded, "
+          f"{len(cassette.missing)} paths missing", file=sys.stderr)
+    if cassette.missing:
+        print(f"  missing paths were answered 404; add them with --record: {', '.join(sorted(cassette.missing)[:5])}",
+              file=sys.stderr)
+
+    checked = mismatched = 0
+    for entry, (_, status, result) in zip(entries, outcomes):
+        if "status" not in entry and "result" not in entry:
+            continue
+        checked += 1
+        found = differences(entry, status, result)
+        if found:
+            mismatched += 1
+            if mismatched <= show_diffs:
+                print(f"  {entry['method']} {entry['plate']!r}: {'; '.join(found)}", file=sys.stderr)
+    if checked:
+        print(f"results     {checked} compared, {mismatched} differ", file=sys.stderr)
+    return mismatched
+
+
+def write_results(path: str, entries, outcomes):
+    with open(path, "w") as f:
+        for entry, (_, status, result) in zip(entries, outcomes):
+            item = {key: entry[key] for key in ("ts", "method", "plate") if entry.get(key) is not None}
+            item.update(status=status, result=result)
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def main(args):
+    app_module.limiter.enabled = args.rate_limit
+    app_module.configure_logging(level="WARNING", fmt="text", module_levels="", stream=sys.stderr)
+
+    entries, skipped = read_log(args.log)
+    if not entries:
+        sys.exit(f"no plate queries in {args.log}")
+    if skipped:
+        print(f"skipped {skipped} lines without a plate", file=sys.stderr)
+
+    upstream = None
+    if args.record == "stub":
+        upstream = httpx.ASGITransport(app=FirestoreStub())
+    elif args.record == "live":
+        upstream = httpx.AsyncHTTPTransport()
+    cassette = Cassette(args.cassette, upstream=upstream, latency=args.upstream_latency)
+    install_cassette(cassette, args.record)
+
+    before = cache_events()
+    outcomes, elapsed, lag = asyncio.run(replay(entries, args.speed, args.concurrency))
+    after = cache_events()
+    events = {event: after[event] - before[event] for event in CACHE_EVENTS}
+
+    if cassette.recorded:
+        cassette.save()
+    if args.write_results:
+        write_results(args.write_results, entries, outcomes)
+    mismatched = report(entries, outcomes, elapsed, lag, events, cassette, args.show_diffs)
+    if mismatched:
+        sys.exit(f"{mismatched} responses differ from the log")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log", help="JSON-lines traffic log")
+    parser.add_argument("--cassette", required=True, help="JSON-lines Firestore cassette, created when recording")
+    parser.add_argument("--record", choices=["live", "stub"],
+                        help="Fetch lookups missing from the cassette from FIRESTORE_BASE_URL or the local stub")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Replay at the log's pace times this factor; 0 sends back to back (default)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients when not replaying at the log's pace")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="Added seconds per cassette answer")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the rate limiter on")
+    parser.add_argument("--write-results", help="Save this run's responses as a log with expected results")
+    parser.add_argument("--show-diffs", type=int, default=10, help="Differing responses to print")
+    main(parser.parse_args())
@@ -0,0 +1,90 @@
+"""
+Region lookup latency and error rate with Firestore faults injected.
+
+Runs concurrent standard-plate checks against a FirestoreStub that answers a
+share of requests slowly or with 503, with the region cache disabled so every
+check goes upstream. "legacy" reproduces the old behaviour (one attempt, 20s
+timeout, no circuit breaker, no concurrency limit); "resilient" uses the
+current defaults (short budgets, hedged/retried attempts within the retry
+budget, circuit breaker and the adaptive concurrency limit, whose shed lookups
+are counted separately). Upstream GETs per check show what hedging costs.
+
+    python benchmarks/bench_resilience.py --checks 400 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+from firestore_stub import FirestoreStub, StubServer, PREFIXES, LETTERS
+
+SCENARIOS = [
+    ("healthy", dict(latency=0.01)),
+    ("5% slow (3s)", dict(latency=0.01, slow_rate=0.05, slow_latency=3.0)),
+    ("10% 503", dict(latency=0.01, failure_rate=0.10)),
+]
+
+
+def make_checker(base_url: str, legacy: bool) -> app_module.IndonesianPlateChecker:
+    source = app_module.FirestoreRegionSource(base_url)
+    if legacy:
+        source.region_timeout = httpx.Timeout(20.0)
+        source.upstream_attempts = 1
+        source.breaker = app_module.CircuitBreaker(failure_threshold=10 ** 9)
+        source.limit = None
+    checker = app_module.IndonesianPlateChecker(region_cache=app_module.RegionCache(maxsize=0), source=source)
+    checker.region_index = {}
+    return checker
+
+
+async def run(checker, checks: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, shed = [], 0, 0
+    plates = [f"{PREFIXES[i % len(PREFIXES)]}{1000 + i}A{LETTERS[i % len(LETTERS)]}" for i in range(checks)]
+
+    async def check(plate):
+        nonlocal errors, shed
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                errors += "error" in await checker.check_plate(plate)
+            except app_module.UpstreamOverloaded:
+                shed += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(check(plate) for plate in plates))
+    await checker.shutdown()
+    latencies.sort()
+    return latencies, errors, shed
+
+
+def main(args):
+    app_module.configure_logging(level="CRITICAL", fmt="text", module_levels="", stream=sys.stderr)
+    for name, faults in SCENARIOS:
+        stub = FirestoreStub(**faults)
+        with StubServer(stub, port=args.port) as server:
+            for mode in ("legacy", "resilient"):
+                checker = make_checker(server.base_url, legacy=(mode == "legacy"))
+                before = stub.requests
+                latencies, errors, shed = asyncio.run(run(checker, args.checks, args.concurrency))
+                p99 = latencies[int(len(latencies) * 0.99) - 1]
+                print(f"{name:<14} {mode:<10} p50 {statistics.median(latencies) * 1000:>7.1f} ms  "
+                      f"p99 {p99 * 1000:>7.1f} ms  max {latencies[-1] * 1000:>7.1f} ms  "
+                      f"errors {errors / len(latencies):>6.1%}  shed {shed / len(latencies):>6.1%}  "
+                      f"upstream GETs {(stub.requests - before) / len(latencies):>4.2f}/check", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checks", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8766)
+    main(parser.parse_args())
@@ -0,0 +1,116 @@
+"""
+Cold-start cost of app:app: import time, the heaviest imports, and time until /health answers.
+
+Every measurement runs in a fresh interpreter, so results are reproducible
+across machines and images. It also fails loudly if any of the legacy heavy
+packages (pandas, numpy, pyspark, ...) end up imported on the serving path.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --server gunicorn
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEAVY_MODULES = ["pandas", "numpy", "pyspark", "psycopg2", "bs4", "fake_useragent", "jose", "cryptography"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def child_env() -> dict:
+    return dict(os.environ, LOG_LEVEL="WARNING", PROMETHEUS_MULTIPROC_DIR="")
+
+
+def import_time() -> dict:
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def top_imports(count: int):
+    """Top-level packages imported by app, by cumulative import time (python -X importtime)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, check=True)
+    rows, children = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            # Children are listed before their parent
+            if name.strip() == "app":
+                rows = children
+            children = []
+    return sorted(rows, reverse=True)[:count]
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def time_to_ready(server: str, port: int) -> float:
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", "1", "-b", f"127.0.0.1:{port}",
+                   "app:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=child_env(), stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/health")
+        return time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(args):
+    import_time()  # warm the bytecode cache, as in a built image
+    imports = [import_time() for _ in range(args.runs)]
+    heavy = sorted({module for run in imports for module in run["heavy"]})
+    seconds = [run["seconds"] for run in imports]
+    print(f"import app        median {statistics.median(seconds) * 1000:>7.1f} ms  "
+          f"min {min(seconds) * 1000:>7.1f} ms", file=sys.stderr)
+    for cumulative, name in top_imports(args.top):
+        print(f"  {name:<24} {cumulative / 1000:>7.1f} ms", file=sys.stderr)
+
+    ready = [time_to_ready(args.server, args.port) for _ in range(args.runs)]
+    print(f"{args.server} to /health median {statistics.median(ready) * 1000:>7.1f} ms  "
+          f"min {min(ready) * 1000:>7.1f} ms", file=sys.stderr)
+
+    if heavy:
+        sys.exit(f"heavy packages imported on the serving path: {', '.join(heavy)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--port", type=int, default=8768)
+    main(parser.parse_args())
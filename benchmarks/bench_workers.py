@@ -0,0 +1,100 @@
+"""
+Requests/sec of the production gunicorn profile at 1, 2 and N workers.
+
+Starts a local Firestore stub, then for each worker count runs
+`gunicorn -c gunicorn.conf.py app:app` against it and drives /check-plate
+with a mixed plate load for a fixed duration.
+
+    python benchmarks/bench_workers.py --duration 10 --concurrency 64
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from firestore_stub import FirestoreStub, StubServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TOKEN = "bench-token"
+PLATES = ["B1234ABC", "D5678XYZ", "F2345KLM", "AB1ZZP", "12345-00", "1234-V", "RI1", "L9999QQ"]
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, headers={"Authorization": f"Bearer {TOKEN}"})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+async def drive(base_url: str, duration: float, concurrency: int) -> int:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    deadline = time.monotonic() + duration
+    completed = 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=30.0) as client:
+        async def worker(offset: int):
+            nonlocal completed
+            i = offset
+            while time.monotonic() < deadline:
+                response = await client.get("/check-plate", params={"plate": PLATES[i % len(PLATES)]})
+                if response.status_code < 500:
+                    completed += 1
+                i += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return completed
+
+
+def run_profile(workers: int, port: int, stub_url: str, args) -> float:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        FIRESTORE_BASE_URL=stub_url,
+        ZEABUR_BEARER_TOKEN=TOKEN,
+        RATE_LIMIT_ENABLED="false",
+        LOG_LEVEL="WARNING",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", "app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(f"{base_url}/"))
+        completed = asyncio.run(drive(base_url, args.duration, args.concurrency))
+        return completed / args.duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args):
+    counts = sorted({1, 2, args.workers or multiprocessing.cpu_count()})
+    with StubServer(FirestoreStub(latency=args.latency), port=args.stub_port) as stub:
+        print(f"stub latency {args.latency * 1000:.0f} ms, concurrency {args.concurrency}, {args.duration:.0f}s per run")
+        for workers in counts:
+            rps = run_profile(workers, args.port, stub.base_url, args)
+            print(f"{workers:>3} worker(s)  {rps:>9.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.005, help="Stub latency per upstream request in seconds")
+    parser.add_argument("--workers", type=int, default=0, help="N for the largest run (default: CPU count)")
+    parser.add_argument("--port", type=int, default=8181)
+    parser.add_argument("--stub-port", type=int, default=8765)
+    main(parser.parse_args())
@@ -0,0 +1,151 @@
+"""
+Local Firestore stand-in for benchmarks.
+
+Serves documents shaped like the real `nopol/{prefix}/belakang/{letter}`
+documents (fields.Provinsi/Daerah/Samsat/Alamat as stringValue) so the
+checker can be pointed at it via FIRESTORE_BASE_URL. Collection listings
+(`nopol`, `nopol/{prefix}/belakang`) follow the list-documents API with
+pageSize/pageToken pagination.
+
+Faults can be injected for resilience testing: a share of requests can be
+answered slowly (slow_rate / slow_latency) or with a 503 (failure_rate).
+With a capacity, at most that many requests are served at once and the rest
+queue, so latency grows with load like a saturated backend.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs
+
+import uvicorn
+
+DOCUMENTS_PATH = "/v1/projects/informasisamsat/databases/(default)/documents"
+
+PREFIXES = ["A", "AB", "AD", "B", "D", "DK", "E", "F", "H", "L", "N", "T", "Z"]
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def make_document(prefix: str, letter: str) -> dict:
+    return {
+        "name": f"projects/informasisamsat/databases/(default)/documents/nopol/{prefix}/belakang/{letter}",
+        "fields": {
+            "Provinsi": {"stringValue": f"Provinsi {prefix}"},
+            "Daerah": {"stringValue": f"Daerah {prefix}-{letter}"},
+            "Samsat": {"stringValue": f"Samsat {prefix} {letter}"},
+            "Alamat": {"stringValue": f"Jl. Samsat No. {ord(letter)}"}
+        }
+    }
+
+
+class FirestoreStub:
+    """Minimal ASGI app answering GET .../nopol/{prefix}/belakang/{letter}"""
+
+    def __init__(self, latency: float = 0.0, prefixes=PREFIXES, letters=LETTERS,
+                 failure_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 5.0, capacity: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.prefixes = sorted(prefixes)
+        self.letters = sorted(letters)
+        self.requests = 0
+        self.capacity = asyncio.Semaphore(capacity) if capacity else None
+
+    def list_page(self, parent: str, ids, query: bytes) -> dict:
+        params = parse_qs(query.decode())
+        page_size = int(params.get("pageSize", ["300"])[0])
+        start = int(params.get("pageToken", ["0"])[0])
+        page = {"documents": [{"name": f"{parent}/{doc_id}"} for doc_id in ids[start:start + page_size]]}
+        if start + page_size < len(ids):
+            page["nextPageToken"] = str(start + page_size)
+        return page
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        if self.capacity is not None:
+            async with self.capacity:
+                await self.respond(scope, send)
+        else:
+            await self.respond(scope, send)
+
+    async def respond(self, scope, send):
+        if self.slow_rate and random.random() < self.slow_rate:
+            await asyncio.sleep(self.slow_latency)
+        elif self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            payload = b'{"error": {"code": 503, "status": "UNAVAILABLE"}}'
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(payload)).encode())]})
+            await send({"type": "http.response.body", "body": payload})
+            return
+
+        parts = scope["path"][len(DOCUMENTS_PATH):].strip("/").split("/")
+        parent = "projects/informasisamsat/databases/(default)/documents/" + "/".join(parts)
+        if len(parts) == 4 and parts[0] == "nopol" and parts[2] == "belakang":
+            status, body = 200, make_document(parts[1], parts[3])
+        elif parts == ["nopol"]:
+            status, body = 200, self.list_page(parent, self.prefixes, scope["query_string"])
+        elif len(parts) == 3 and parts[0] == "nopol" and parts[2] == "belakang" and parts[1] in self.prefixes:
+            page = self.list_page(parent, self.letters, scope["query_string"])
+            for document in page["documents"]:
+                document.update(make_document(parts[1], document["name"].rsplit("/", 1)[1]))
+            status, body = 200, page
+        else:
+            status, body = 404, {"error": {"code": 404, "status": "NOT_FOUND"}}
+
+        payload = json.dumps(body).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(payload)).encode())]
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+class StubServer:
+    """Run a FirestoreStub on a background thread for the duration of a `with` block"""
+
+    def __init__(self, stub: FirestoreStub, host: str = "127.0.0.1", port: int = 8765):
+        self.stub = stub
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(stub, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}{DOCUMENTS_PATH}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local Firestore stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--capacity", type=int, default=0, help="Requests served at once, the rest queue; 0 is unlimited")
+    args = parser.parse_args()
+    stub = FirestoreStub(latency=args.latency, failure_rate=args.failure_rate,
+                         slow_rate=args.slow_rate, slow_latency=args.slow_latency, capacity=args.capacity)
+    uvicorn.run(stub, host="127.0.0.1", port=args.port, log_level="warning")
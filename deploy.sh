@@ -119,7 +119,7 @@ show_status() {
     fi
     
     # Check FastAPI health
-    if curl -f -s http://localhost:8080/ > /dev/null 2>&1; then
+    if curl -f -s http://localhost:8080/health > /dev/null 2>&1; then
         log_success "✓ FastAPI is healthy"
     else
         log_error "✗ FastAPI is not responding"
@@ -1,15 +1,20 @@
+import multiprocessing
 import os
 
 # Server socket
 bind = f"0.0.0.0:{os.environ.get('PORT', 5555)}"
 backlog = 2048
 
-# Worker processes
-workers = 1
-worker_class = "sync"
+# Worker processes - ASGI workers, one per CPU core unless overridden
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 timeout = 30
-keepalive = 2
+graceful_timeout = 30
+
+# Keep upstream connections from nginx (upstream fastapi_backend { keepalive 32; })
+# open longer than nginx keeps them idle, so nginx never reuses a socket we just closed
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 75))
 
 # Logging
 accesslog = "-"
@@ -19,7 +24,8 @@ loglevel = "info"
 # Process naming
 proc_name = "indonesian-plate-checker"
 
-# Server mechanics
+# Server mechanics - the app (and the checker tables) is built once in the master
+# and shared copy-on-write with the forked workers
 preload_app = True
 daemon = False
 pidfile = None
@@ -29,4 +35,24 @@ tmp_upload_dir = None
 
 # SSL
 keyfile = None
-certfile = None
\ No newline at end of file
+certfile = None
+
+# Start every deployment with an empty metrics directory
+def on_starting(server):
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+
+# Move preloaded objects out of the GC's tracked generations so collections in the
+# workers do not touch (and un-share) the pages inherited from the master
+def when_ready(server):
+    import gc
+    gc.freeze()
+
+# Metrics - drop live gauges of exited workers when aggregating across processes
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,143 @@
+"""
+Adaptive concurrency limit: grows while calls stay fast, backs off on latency or timeouts, probes
+for a fresh baseline after a congested window and sheds callers over the limit.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app as app_module
+
+FAST = 0.010
+SLOW = 0.500
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_limit(clock: FakeClock, **kwargs) -> app_module.AdaptiveConcurrencyLimit:
+    options = dict(initial=10, min_limit=2, max_limit=100, tolerance=2.0, window=50, probe_calls=5, slack=0.0)
+    options.update(kwargs)
+    return app_module.AdaptiveConcurrencyLimit(clock=clock, **options)
+
+
+def call(limit, clock: FakeClock, latency: float, failed: bool = False, timed_out: bool = False):
+    """One call that started `latency` seconds ago on the fake clock"""
+    assert limit.acquire()
+    clock.now += latency
+    limit.release(latency, failed, timed_out)
+
+
+def settle(limit, clock: FakeClock):
+    """One uncongested window of fast calls, so the baseline is FAST"""
+    for _ in range(limit.window):
+        call(limit, clock, FAST)
+    assert abs(limit.baseline - FAST) < 1e-9
+
+
+def hold(limit, slots: int):
+    """Keep `slots` calls in flight so the limit counts as in use"""
+    for _ in range(slots):
+        assert limit.acquire()
+
+
+def test_fast_calls_under_load_grow_the_limit():
+    clock = FakeClock()
+    limit = make_limit(clock)
+    hold(limit, 5)
+    for _ in range(30):
+        call(limit, clock, FAST)
+    assert limit.limit > 12
+
+
+def test_idle_limit_does_not_grow():
+    clock = FakeClock()
+    limit = make_limit(clock)
+    for _ in range(30):
+        call(limit, clock, FAST)
+    assert limit.limit == 10
+
+
+def test_latency_above_tolerance_cuts_the_limit_once_per_round_trip():
+    clock = FakeClock()
+    limit = make_limit(clock)
+    settle(limit, clock)
+    # Overlapping slow calls all complete within one round trip of each other
+    hold(limit, 5)
+    for _ in range(5):
+        limit.release(SLOW, False)
+    assert limit.limit == 9.0
+    clock.now += SLOW
+    call(limit, clock, SLOW)
+    assert limit.limit == 8.1
+
+
+def test_errors_leave_the_limit_alone_unless_they_time_out():
+    clock = FakeClock()
+    limit = make_limit(clock)
+    settle(limit, clock)
+    # Fast or slow (a failed lookup's latency includes its retries), an error is no congestion signal
+    for latency in (FAST / 2, SLOW):
+        call(limit, clock, latency, failed=True)
+    assert limit.limit == 10
+    assert not limit.congested
+    call(limit, clock, 1.5 * FAST, failed=True, timed_out=True)
+    assert limit.limit == 9.0
+    assert limit.congested
+
+
+def test_congested_window_probes_for_a_new_baseline():
+    clock = FakeClock()
+    limit = make_limit(clock, min_limit=1)
+    settle(limit, clock)
+    for _ in range(3):
+        call(limit, clock, SLOW)
+    backed_off = limit.limit
+    assert backed_off < 10
+    while limit.probe_started is None:
+        call(limit, clock, FAST)
+    resume = limit.resume_limit
+    assert limit.limit == 1
+    assert resume <= backed_off / 2
+
+    # A call admitted before the probe began measured our own queue and is ignored
+    assert limit.acquire()
+    limit.release(SLOW * 10, False)
+    for _ in range(5):
+        call(limit, clock, SLOW)
+    assert limit.probe_started is None
+    assert limit.baseline == SLOW
+    assert limit.limit == resume
+
+
+def test_step_in_latency_before_the_first_window_is_not_congestion():
+    clock = FakeClock()
+    limit = make_limit(clock)
+    for _ in range(20):
+        call(limit, clock, FAST)
+    # Without a completed window the running mean follows the step, so there is nothing to back off from
+    for _ in range(30):
+        call(limit, clock, SLOW)
+    assert limit.limit == 10
+    assert limit.probe_started is None
+    assert limit.baseline < SLOW
+
+
+def test_callers_over_the_limit_are_shed():
+    clock = FakeClock()
+    limit = make_limit(clock, initial=3)
+    shed = app_module.UPSTREAM_SHED_TOTAL._value.get()
+    hold(limit, 3)
+    assert not limit.acquire()
+    assert not limit.acquire(shed=False)
+    assert app_module.UPSTREAM_SHED_TOTAL._value.get() == shed + 1
+    limit.release(0.0, None)
+    assert limit.acquire()
@@ -0,0 +1,55 @@
+"""
+Batches and stream uploads: every BATCH_PLATES_PER_HIT plates count against the route's own rate limits.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient
+from limits import parse as parse_limit
+
+import app as app_module
+
+HEADERS = {"Authorization": f"Bearer {app_module.ZEABUR_BEARER_TOKEN}"}
+
+
+def route_limit() -> int:
+    return min(parse_limit(app_module.RATE_LIMIT).amount, parse_limit(app_module.TOKEN_RATE_LIMIT).amount)
+
+
+def test_large_upload_exhausts_the_limit_for_the_next_request():
+    limit = route_limit()
+    # Exactly `limit` hits: the decorator's one plus the lines charged while spooling
+    body = b"not-a-plate\n" * (limit * app_module.BATCH_PLATES_PER_HIT)
+    app_module.limiter.reset()
+    try:
+        client = TestClient(app_module.app)
+        upload = client.post("/check-plates/stream", content=body, headers=HEADERS)
+        assert upload.status_code == 200
+        assert len(upload.text.splitlines()) == limit * app_module.BATCH_PLATES_PER_HIT
+
+        following = client.post("/check-plates/stream", content=b"not-a-plate\n", headers=HEADERS)
+        assert following.status_code == 429
+    finally:
+        app_module.limiter.reset()
+
+
+def test_batches_are_charged_per_plate():
+    plates = ["not-a-plate"] * app_module.BATCH_MAX_PLATES
+    hits = -(-len(plates) // app_module.BATCH_PLATES_PER_HIT)
+    app_module.limiter.reset()
+    try:
+        client = TestClient(app_module.app)
+        for _ in range(route_limit() // hits):
+            batch = client.post("/check-plates", json={"plates": plates}, headers=HEADERS)
+            assert batch.status_code == 200
+            assert batch.json()["count"] == len(plates)
+
+        following = client.post("/check-plates", json={"plates": plates}, headers=HEADERS)
+        assert following.status_code == 429
+        assert following.json()["error"].startswith("Rate limit exceeded")
+    finally:
+        app_module.limiter.reset()
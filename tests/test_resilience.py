@@ -0,0 +1,225 @@
+"""
+Region lookup resilience against a mocked Firestore transport: hedging, the retry budget, the
+circuit breaker and stale serving.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app as app_module
+
+BASE_URL = "http://firestore.test/v1/projects/informasisamsat/databases/(default)/documents"
+DOCUMENT = {
+    "fields": {
+        "Provinsi": {"stringValue": "DKI Jakarta"},
+        "Daerah": {"stringValue": "Jakarta Pusat"},
+        "Samsat": {"stringValue": "Samsat Jakarta Pusat"},
+        "Alamat": {"stringValue": "Jl. Gunung Sahari"},
+    }
+}
+
+
+class ScriptedUpstream:
+    """Mock Firestore answering each request with the next scripted outcome: a status, or "hang" """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if outcome == "hang":
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        if outcome == "error":
+            raise httpx.ConnectError("upstream down", request=request)
+        return httpx.Response(outcome, json=DOCUMENT if outcome == 200 else {})
+
+
+def make_source(upstream: ScriptedUpstream) -> app_module.FirestoreRegionSource:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    source = app_module.FirestoreRegionSource(base_url=BASE_URL, client=client)
+    source.attempt_latency = app_module.LatencyQuantile(initial=0.01)
+    return source
+
+
+def hedged(upstream: ScriptedUpstream, max_attempts: int = 2, may_add=None) -> httpx.Response:
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+            return await app_module.hedged_get(lambda: client.get(f"{BASE_URL}/nopol/B/belakang/C"),
+                                               0.01, max_attempts, may_add)
+
+    return asyncio.run(scenario())
+
+
+def test_hedge_answers_for_a_hanging_attempt_and_the_loser_is_cancelled():
+    upstream = ScriptedUpstream("hang", 200)
+    asked = []
+    response = hedged(upstream, may_add=lambda hedge: asked.append(hedge) or True)
+    assert response.status_code == 200
+    assert upstream.calls == 2
+    assert upstream.cancelled == 1
+    assert asked == [True]
+
+
+def test_failed_attempt_is_retried_as_a_retry_not_a_hedge():
+    upstream = ScriptedUpstream(503, 200)
+    asked = []
+    response = hedged(upstream, may_add=lambda hedge: asked.append(hedge) or True)
+    assert response.status_code == 200
+    assert asked == [False]
+
+
+def test_refused_extra_attempt_returns_the_failed_response():
+    upstream = ScriptedUpstream(503, 200)
+    response = hedged(upstream, may_add=lambda hedge: False)
+    assert response.status_code == 503
+    assert upstream.calls == 1
+
+
+def test_last_error_is_raised_when_every_attempt_fails():
+    upstream = ScriptedUpstream("error")
+    try:
+        hedged(upstream, max_attempts=3)
+    except httpx.ConnectError:
+        pass
+    else:
+        raise AssertionError("expected the upstream error")
+    assert upstream.calls == 3
+
+
+def test_retry_budget_allows_the_burst_then_the_ratio_of_lookups():
+    budget = app_module.RetryBudget(ratio=0.25, burst=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    for _ in range(3):
+        budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    for _ in range(100):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+def test_lookup_spends_the_budget_on_retries_only_while_it_lasts():
+    async def scenario():
+        upstream = ScriptedUpstream(503)
+        source = make_source(upstream)
+        source.breaker = app_module.CircuitBreaker(failure_threshold=10 ** 9)
+        source.retry_budget = app_module.RetryBudget(ratio=0.0, burst=1)
+        for _ in range(3):
+            try:
+                await source.lookup("B", "C")
+            except app_module.UpstreamStatusError:
+                pass
+        await source.shutdown()
+        return upstream.calls
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_hedge_delay_learns_from_successful_attempts_only():
+    async def scenario():
+        upstream = ScriptedUpstream(503, 503, 200)
+        source = make_source(upstream)
+        source.breaker = app_module.CircuitBreaker(failure_threshold=10 ** 9)
+        source.upstream_attempts = 1
+        for _ in range(3):
+            try:
+                await source.lookup("B", "C")
+            except app_module.UpstreamStatusError:
+                pass
+        await source.shutdown()
+        return list(source.attempt_latency.samples)
+
+    assert len(asyncio.run(scenario())) == 1
+
+
+def test_hedge_delay_is_capped():
+    quantile = app_module.LatencyQuantile(every=10, maximum=1.0)
+    for _ in range(10):
+        quantile.add(5.0)
+    assert quantile.value == 1.0
+
+
+def test_circuit_opens_after_consecutive_failures_and_closes_after_a_good_trial():
+    breaker = app_module.CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    # One trial per reset_timeout once it has passed; a failed trial keeps the circuit open
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_open_circuit_fails_fast_without_calling_upstream():
+    async def scenario():
+        upstream = ScriptedUpstream(200)
+        source = make_source(upstream)
+        source.breaker.opened_at = app_module.time.monotonic()
+        try:
+            await source.lookup("B", "C")
+        except app_module.UpstreamUnavailable:
+            pass
+        else:
+            raise AssertionError("expected UpstreamUnavailable")
+        await source.shutdown()
+        source.breaker.record_success()
+        return upstream.calls
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_expired_region_is_served_stale_while_a_failed_refresh_keeps_it():
+    async def scenario():
+        upstream = ScriptedUpstream(200, "error", 200)
+        source = make_source(upstream)
+        source.upstream_attempts = 1
+        cache = app_module.RegionCache(ttl=0.01, stale_ttl=60)
+        checker = app_module.IndonesianPlateChecker(region_cache=cache, source=source)
+        checker.region_index = {}
+
+        fresh = await checker.fetch_region("B", "C")
+        await asyncio.sleep(0.02)
+        served = []
+        for _ in range(2):
+            # Each stale serve starts one background refresh: the first fails, the second succeeds
+            served.append(await checker.fetch_region("B", "C"))
+            while checker._revalidating:
+                await asyncio.sleep(0)
+        refreshed = cache.get(("B", "C"))
+        await checker.shutdown()
+        return fresh, served, refreshed, cache.stale_hits, upstream.calls
+
+    fresh, served, refreshed, stale_hits, calls = asyncio.run(scenario())
+    assert served == [fresh, fresh]
+    assert refreshed == fresh
+    assert stale_hits == 2
+    assert calls == 3
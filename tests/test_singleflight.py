@@ -0,0 +1,121 @@
+"""
+Request coalescing: concurrent identical region lookups share one Firestore request.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+import pytest
+
+import app as app_module
+
+BASE_URL = "http://firestore.test/v1/projects/informasisamsat/databases/(default)/documents"
+DOCUMENT = {
+    "fields": {
+        "Provinsi": {"stringValue": "DKI Jakarta"},
+        "Daerah": {"stringValue": "Jakarta Pusat"},
+        "Samsat": {"stringValue": "Samsat Jakarta Pusat"},
+        "Alamat": {"stringValue": "Jl. Gunung Sahari"},
+    }
+}
+WAITERS = 50
+
+
+class GatedUpstream:
+    """Mock Firestore that holds every request until released, then answers or fails it"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.fail = False
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise httpx.ConnectError("upstream down", request=request)
+        return httpx.Response(200, json=DOCUMENT)
+
+
+def make_checker(upstream: GatedUpstream) -> app_module.IndonesianPlateChecker:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    source = app_module.FirestoreRegionSource(base_url=BASE_URL, client=client)
+    source.upstream_attempts = 1  # no hedges or retries, so upstream calls are lookups
+    checker = app_module.IndonesianPlateChecker(region_cache=app_module.RegionCache(), source=source)
+    checker.region_index = {}
+    return checker
+
+
+async def gather_waiters(checker, upstream: GatedUpstream):
+    """Start WAITERS identical lookups, release the upstream once it is called and collect every outcome"""
+    waiters = [asyncio.ensure_future(checker.fetch_region("B", "C")) for _ in range(WAITERS)]
+    # Every waiter joins the shared call in its first step, before that call reaches the upstream
+    while upstream.calls == 0:
+        await asyncio.sleep(0)
+    upstream.release.set()
+    return await asyncio.gather(*waiters, return_exceptions=True)
+
+
+def test_concurrent_lookups_make_one_upstream_call():
+    async def scenario():
+        upstream = GatedUpstream()
+        checker = make_checker(upstream)
+        results = await gather_waiters(checker, upstream)
+        await checker.shutdown()
+        return upstream, results
+
+    upstream, results = asyncio.run(scenario())
+    assert upstream.calls == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]["plate_region"]["province"] == "DKI Jakarta"
+
+
+def test_upstream_error_reaches_every_waiter_without_poisoning_the_next_call():
+    async def scenario():
+        upstream = GatedUpstream()
+        upstream.fail = True
+        checker = make_checker(upstream)
+        failed = await gather_waiters(checker, upstream)
+        calls_while_failing = upstream.calls
+        assert len(checker.inflight) == 0
+
+        upstream.fail = False
+        recovered = await checker.fetch_region("B", "C")
+        await checker.shutdown()
+        return calls_while_failing, upstream.calls, failed, recovered
+
+    calls_while_failing, calls, failed, recovered = asyncio.run(scenario())
+    assert calls_while_failing == 1
+    assert all(isinstance(result, httpx.ConnectError) for result in failed)
+    assert calls == 2
+    assert recovered["plate_region"]["city"] == "Jakarta Pusat"
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = app_module.SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "region"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return calls, await second
+
+    assert asyncio.run(scenario()) == (1, "region")